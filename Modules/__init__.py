@@ -1,11 +1,34 @@
 from .ssh import SSHManager
+from .ssh_stream import CommandStream
 from .report import ReportGenerator, TableType
+from .ssh_broker import SSHBroker, BrokerClient
+from .result_store import ResultStore
+from .result import Status, CheckResult
+from .log import setup_logging, log_context
+from .command_cache import CommandCache
+from .circuit import CircuitBreaker, FailureKind
+from .metrics import MetricsRegistry, metrics
+from .ssh_profile import ConnectionProfile
 
 __version__ = "1.0.0"
 
 __all__ = [
     "SSHManager",
+    "CommandStream",
     "ReportGenerator",
-    "TableType"
+    "TableType",
+    "SSHBroker",
+    "BrokerClient",
+    "ResultStore",
+    "Status",
+    "CheckResult",
+    "setup_logging",
+    "log_context",
+    "CommandCache",
+    "CircuitBreaker",
+    "FailureKind",
+    "MetricsRegistry",
+    "metrics",
+    "ConnectionProfile",
 ]
 
@@ -0,0 +1,146 @@
+import errno
+import logging
+import socket
+import threading
+import time
+from enum import Enum
+from typing import Dict, Optional
+
+class FailureKind(Enum):
+    AUTH = "auth"
+    REFUSED = "refused"
+    TIMEOUT = "timeout"
+    UNREACHABLE = "unreachable"
+    OTHER = "other"
+
+
+def classify(error: BaseException) -> FailureKind:
+    """
+    Maps a connection error from paramiko, pywinrm/requests or the socket layer to a FailureKind.
+    Matches on class names so neither client library has to be imported here.
+    """
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & {"AuthenticationException", "InvalidCredentialsError"}:
+        return FailureKind.AUTH
+    # paramiko reports one error per resolved address when every connection attempt failed
+    errors = getattr(error, "errors", None)
+    if isinstance(errors, dict) and errors:
+        return classify(next(iter(errors.values())))
+    if isinstance(error, ConnectionRefusedError) or getattr(error, "errno", None) == errno.ECONNREFUSED:
+        return FailureKind.REFUSED
+    if isinstance(error, (TimeoutError, socket.timeout)) or any("Timeout" in name for name in names):
+        return FailureKind.TIMEOUT
+    if getattr(error, "errno", None) in (errno.EHOSTUNREACH, errno.ENETUNREACH):
+        return FailureKind.UNREACHABLE
+    message = str(error).lower()
+    if "refused" in message:
+        return FailureKind.REFUSED
+    if "timed out" in message or "banner" in message:
+        return FailureKind.TIMEOUT
+    if "unreachable" in message or "no route" in message:
+        return FailureKind.UNREACHABLE
+    return FailureKind.OTHER
+
+
+class _HostCircuit:
+    __slots__ = ("failures", "auth_failures", "last_kind", "opened_at", "trial_at")
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.auth_failures = 0
+        self.last_kind: Optional[FailureKind] = None
+        self.opened_at: Optional[float] = None
+        # Half-open state: when the trial attempt was let through
+        self.trial_at: Optional[float] = None
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 10, auth_threshold: int = 3, reset_timeout: float = 120.0) -> None:
+        """
+        Per-host circuit breaker shared by every connection layer of a process. After `threshold`
+        consecutive failed connection attempts (`auth_threshold` for rejected credentials, which
+        retrying rarely fixes) the circuit opens and further attempts are refused immediately.
+        Once `reset_timeout` seconds have passed the circuit is half-open: the first caller gets a
+        single trial attempt, which closes the circuit on success and re-opens it on failure.
+        :param threshold: Consecutive failures that open the circuit.
+        :param auth_threshold: Consecutive authentication failures that open the circuit.
+        :param reset_timeout: Time (in seconds) an open circuit waits before allowing a trial attempt.
+        """
+        self.threshold = threshold
+        self.auth_threshold = auth_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: Dict[str, _HostCircuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host: str) -> _HostCircuit:
+        return self._hosts.setdefault(host, _HostCircuit())
+
+    def is_open(self, host: str) -> bool:
+        """True while the host's circuit is open, including the half-open trial window."""
+        with self._lock:
+            return self._circuit(host).opened_at is not None
+
+    def _blocked(self, circuit: _HostCircuit, now: float) -> bool:
+        if circuit.opened_at is None:
+            return False
+        if now - circuit.opened_at < self.reset_timeout:
+            return True
+        # A trial whose outcome is never recorded is given up after another reset period
+        return circuit.trial_at is not None and now - circuit.trial_at < self.reset_timeout
+
+    def blocked(self, host: str) -> bool:
+        """Whether allow() would refuse the host now, without taking the half-open trial."""
+        with self._lock:
+            return self._blocked(self._circuit(host), time.monotonic())
+
+    def allow(self, host: str) -> bool:
+        """
+        Whether a connection attempt to the host may be made now. Call it right before the attempt:
+        in the half-open state it hands out the single trial, and refuses everyone else until the
+        trial's outcome is recorded.
+        """
+        with self._lock:
+            circuit = self._circuit(host)
+            now = time.monotonic()
+            if self._blocked(circuit, now):
+                return False
+            if circuit.opened_at is not None:
+                circuit.trial_at = now
+                logging.info(f"Circuit for {host} half-open, letting one trial attempt through.")
+            return True
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.opened_at is not None:
+                logging.info(f"Circuit for {host} closed again.")
+            self._hosts[host] = _HostCircuit()
+
+    def record_failure(self, host: str, error: BaseException) -> FailureKind:
+        """Counts a failed connection attempt and returns its classification."""
+        kind = classify(error)
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.failures += 1
+            circuit.auth_failures = circuit.auth_failures + 1 if kind == FailureKind.AUTH else 0
+            circuit.last_kind = kind
+            if (circuit.opened_at is not None or circuit.failures >= self.threshold
+                    or circuit.auth_failures >= self.auth_threshold):
+                # A failed trial attempt re-opens the circuit for another reset period
+                if circuit.opened_at is None:
+                    logging.error(f"Circuit for {host} opened after {circuit.failures} failed attempts (last: {kind.value}).")
+                circuit.opened_at = time.monotonic()
+                circuit.trial_at = None
+        return kind
+
+    def describe(self, host: str) -> str:
+        """Short reason for an open circuit, used as the detail of short-circuited checks."""
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.opened_at is None:
+                return ""
+            return f"host unreachable: {circuit.failures} failed connection attempts ({circuit.last_kind.value})"
+
+
+# Shared by SSHManager, RDPManager and ServerManager unless they are given their own
+default_breaker = CircuitBreaker()
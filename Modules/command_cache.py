@@ -0,0 +1,51 @@
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+class CommandCache:
+    def __init__(self) -> None:
+        """
+        Memoizes the output of read-only remote commands per host.
+        Entries stay valid until `invalidate` is called, which callers do after any
+        mutating operation or reconnect. Failed commands (None output) are never cached.
+        """
+        self._entries: Dict[Tuple[Optional[str], str], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, host: Optional[str], command: str, execute: Callable[[str], Optional[str]]) -> Optional[str]:
+        """
+        Returns the cached output of `command` on `host`, or runs it with `execute` and caches the result.
+        :param host: Host the command runs on.
+        :param command: The read-only command.
+        :param execute: Callable running the command and returning its output (or None on failure).
+        """
+        key = (host, command)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        output = execute(command)
+        if output is not None:
+            with self._lock:
+                self._entries[key] = output
+        return output
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        """Drops the cached outputs of one host, or of every host when none is given."""
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+            else:
+                self._entries = {key: output for key, output in self._entries.items() if key[0] != host}
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,45 @@
+import time
+from typing import Optional
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class Deadline:
+    def __init__(self, budget: Optional[float] = None, parent: Optional["Deadline"] = None) -> None:
+        """
+        A point in time that every layer sizes its timeouts against.
+        :param budget: Time (in seconds) from now until the deadline, None for no limit.
+        :param parent: Optional enclosing deadline; the earlier of the two wins.
+        """
+        self.expires_at = time.monotonic() + budget if budget is not None else None
+        if parent and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+
+    def child(self, budget: Optional[float]) -> "Deadline":
+        """Returns a deadline of at most `budget` seconds that never outlives this one."""
+        return Deadline(budget, parent=self)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None if there is no limit."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, default: Optional[float]) -> Optional[float]:
+        """
+        Sizes a per-operation timeout: the default capped by the remaining budget.
+        Returns the default unchanged when there is no limit.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    def check(self, operation: str) -> None:
+        """Raises DeadlineExceeded if the budget is already used up."""
+        if self.expired():
+            raise DeadlineExceeded(f"Time budget exhausted before {operation}")
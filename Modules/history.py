@@ -0,0 +1,174 @@
+import glob
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .result import CheckResult, Status
+
+# Statuses are stored by name, so reordering or extending Status keeps old chunks readable
+STRING_COLUMNS = ("image", "check", "host", "os_type", "status")
+NUMERIC_COLUMNS = {"run_at": np.float64, "duration": np.float64}
+
+Columns = Dict[str, np.ndarray]
+
+
+class ResultHistory:
+    def __init__(self, directory: str) -> None:
+        """
+        Append-only columnar history of check results, kept as compressed NumPy chunks
+        (one `.npz` file per run) so analytics can load thousands of runs as whole arrays.
+        String columns are dictionary-encoded per chunk.
+        :param directory: Directory holding the chunk files, created on the first append.
+        """
+        self.directory = directory
+
+    def _chunks(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.npz")))
+
+    def _write(self, columns: Columns, suffix: str = "") -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        arrays = {name: columns[name].astype(dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        for name in STRING_COLUMNS:
+            arrays[f"{name}_values"], arrays[f"{name}_codes"] = np.unique(columns[name], return_inverse=True)
+            arrays[f"{name}_codes"] = arrays[f"{name}_codes"].astype(np.int32)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:12]}{suffix}"
+        # np.savez appends .npz itself; writing under another name first keeps readers off partial files
+        temporary = os.path.join(self.directory, f".{name}.tmp.npz")
+        np.savez_compressed(temporary, **arrays)
+        path = os.path.join(self.directory, f"{name}.npz")
+        os.replace(temporary, path)
+        return path
+
+    def append(self, results: Iterable[CheckResult], os_type: Optional[str] = None,
+               run_at: Optional[float] = None) -> Optional[str]:
+        """
+        Stores the results of one run as a new chunk.
+        :param os_type: Detected OS of the host, if known.
+        :param run_at: UNIX time of the run, defaults to now.
+        :return: Path of the chunk, None when there was nothing to store.
+        """
+        results = list(results)
+        if not results:
+            return None
+        columns = {
+            "run_at": np.full(len(results), run_at or time.time()),
+            "status": np.array([result.status.name for result in results]),
+            "duration": np.array([result.duration for result in results]),
+            "image": np.array([result.image or "" for result in results]),
+            "check": np.array([result.check for result in results]),
+            "host": np.array([result.host or "" for result in results]),
+            "os_type": np.full(len(results), os_type or ""),
+        }
+        path = self._write(columns)
+        logging.info(f"Appended {len(results)} results to {path}")
+        return path
+
+    def load(self, since: Optional[float] = None) -> Columns:
+        """Concatenates every chunk into one array per column, optionally only runs after `since`."""
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in (*NUMERIC_COLUMNS, *STRING_COLUMNS)}
+        for path in self._chunks():
+            with np.load(path) as chunk:
+                for name in NUMERIC_COLUMNS:
+                    parts[name].append(chunk[name])
+                for name in STRING_COLUMNS:
+                    parts[name].append(chunk[f"{name}_values"][chunk[f"{name}_codes"]])
+        columns = {name: np.concatenate(arrays) if arrays else np.empty(0, NUMERIC_COLUMNS.get(name, str))
+                   for name, arrays in parts.items()}
+        if since is not None:
+            keep = columns["run_at"] >= since
+            columns = {name: values[keep] for name, values in columns.items()}
+        return columns
+
+    def compact(self) -> Optional[str]:
+        """Rewrites all current chunks as one, so loading stays a handful of file reads."""
+        chunks = self._chunks()
+        if len(chunks) < 2:
+            return None
+        path = self._write(self.load(), suffix="-compacted")
+        # Chunks appended meanwhile were not read and are kept
+        for chunk in chunks:
+            os.remove(chunk)
+        logging.info(f"Compacted {len(chunks)} chunks into {path}")
+        return path
+
+
+def group(columns: Columns, by: Sequence[str]) -> Tuple[List[Tuple[str, ...]], np.ndarray]:
+    """Returns the distinct key tuples of the `by` columns and the group index of every row."""
+    if not len(columns["run_at"]):
+        return [], np.empty(0, dtype=np.int64)
+    uniques, codes = zip(*(np.unique(columns[name], return_inverse=True) for name in by))
+    combined = np.zeros(len(columns["run_at"]), dtype=np.int64)
+    for values, inverse in zip(uniques, codes):
+        combined = combined * len(values) + inverse
+    keys, groups = np.unique(combined, return_inverse=True)
+    labels = []
+    for key in keys:
+        label = []
+        for values in reversed(uniques):
+            key, index = divmod(key, len(values))
+            label.append(str(values[index]))
+        labels.append(tuple(reversed(label)))
+    return labels, groups
+
+
+def percentiles(values: np.ndarray, groups: np.ndarray, n_groups: int, qs: Sequence[float]) -> np.ndarray:
+    """
+    Linearly interpolated percentiles of `values` per group, in one sort.
+    :return: Array of shape (n_groups, len(qs)); NaN for empty groups.
+    """
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((n_groups, len(qs)), np.nan)
+    present = counts > 0
+    for column, q in enumerate(qs):
+        position = (counts[present] - 1) * (q / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        base = starts[present]
+        result[present, column] = ordered[base + low] + (ordered[base + high] - ordered[base + low]) * (position - low)
+    return result
+
+
+def summarize(columns: Columns, by: Sequence[str] = ("image", "check"), qs: Sequence[float] = (50, 95)) -> List[Dict]:
+    """
+    Runs, failure rate and duration percentiles per group. Percentiles only count passed checks,
+    as failures and timeouts measure the retry limits rather than the image.
+    """
+    labels, groups = group(columns, by)
+    if not labels:
+        return []
+    passed = columns["status"] == Status.PASS.name
+    runs = np.bincount(groups, minlength=len(labels))
+    failed = np.bincount(groups, weights=~passed, minlength=len(labels))
+    durations = percentiles(columns["duration"][passed], groups[passed], len(labels), qs)
+    return [{**dict(zip(by, label)), "runs": int(runs[index]), "failure_rate": float(failed[index] / runs[index]),
+             **{f"p{q:g}": float(durations[index, column]) for column, q in enumerate(qs)}}
+            for index, label in enumerate(labels)]
+
+
+def regressions(columns: Columns, by: Sequence[str] = ("image", "check"), window: float = 7 * 86400,
+                threshold: float = 0.2, min_runs: int = 5, now: Optional[float] = None) -> List[Dict]:
+    """
+    Groups whose median duration over the last `window` seconds exceeds the median of the runs
+    before it by more than `threshold` (0.2 = 20 %). Both periods need `min_runs` passed checks.
+    """
+    labels, groups = group(columns, by)
+    if not labels:
+        return []
+    passed = columns["status"] == Status.PASS.name
+    recent = columns["run_at"] >= (now or time.time()) - window
+    medians = {}
+    for period, mask in (("recent", passed & recent), ("baseline", passed & ~recent)):
+        counts = np.bincount(groups[mask], minlength=len(labels))
+        median = percentiles(columns["duration"][mask], groups[mask], len(labels), (50,))[:, 0]
+        medians[period] = np.where(counts >= min_runs, median, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change = medians["recent"] / medians["baseline"] - 1
+    flagged = np.flatnonzero(change > threshold)
+    return [{**dict(zip(by, labels[index])), "baseline_p50": float(medians["baseline"][index]),
+             "recent_p50": float(medians["recent"][index]), "change": float(change[index])}
+            for index in flagged[np.argsort(-change[flagged])]]
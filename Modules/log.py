@@ -0,0 +1,131 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+from contextlib import contextmanager
+from typing import Optional
+
+_host = contextvars.ContextVar("log_host", default="-")
+_op = contextvars.ContextVar("log_op", default="-")
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """Tags every record with the host and operation of the current context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "host"):
+            record.host = _host.get()
+        if not hasattr(record, "op"):
+            record.op = _op.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "host": getattr(record, "host", "-"),
+            "op": getattr(record, "op", "-"),
+            "message": record.getMessage(),
+        })
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tags must be read on the producing thread, the listener thread has its own context
+        ContextFilter().filter(record)
+        return super().prepare(record)
+
+
+@contextmanager
+def log_context(host: Optional[str] = None, op: Optional[str] = None):
+    """Tags log records emitted inside the block (on this thread) with host and/or operation."""
+    tokens = []
+    if host is not None:
+        tokens.append((_host, _host.set(host)))
+    if op is not None:
+        tokens.append((_op, _op.set(op)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_operation() -> str:
+    """Operation tag of the current context, "-" outside any log_context."""
+    return _op.get()
+
+
+def setup_logging(level: int = logging.INFO, rich: bool = True, json_file: Optional[str] = None) -> None:
+    """
+    Routes all logging through a queue so producers never block on console rendering.
+    Rich (or plain) console output and the optional JSON-lines file are written by a
+    single listener thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener:
+        return
+
+    if rich:
+        from rich.logging import RichHandler
+        console = RichHandler(show_path=False)
+        console.setFormatter(logging.Formatter("[%(host)s %(op)s] %(message)s", datefmt="[%X]"))
+    else:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(host)s %(op)s] %(message)s", datefmt="[%H:%M:%S]"))
+    handlers = [console]
+    if json_file:
+        json_handler = logging.FileHandler(json_file, encoding="utf-8")
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    root.handlers = [_ContextQueueHandler(log_queue)]
+    root.setLevel(level)
+    # paramiko logs every transport event at INFO
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+
+
+class _Relay(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def forward_logging(log_queue, level: int = logging.INFO) -> None:
+    """
+    Sends the records of a worker process to the parent through `log_queue`
+    (e.g. a multiprocessing Manager queue); the parent renders them with `relay_logging`.
+    """
+    global _listener
+    # A forked worker inherits the parent's listener object but not its thread
+    _listener = None
+    root = logging.getLogger()
+    root.handlers = [_ContextQueueHandler(log_queue)]
+    root.setLevel(level)
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+
+
+def relay_logging(log_queue) -> logging.handlers.QueueListener:
+    """Starts a listener passing records forwarded by worker processes to this process's handlers."""
+    listener = logging.handlers.QueueListener(log_queue, _Relay())
+    listener.start()
+    return listener
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,143 @@
+import bisect
+import http.server
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from .log import current_operation
+
+# Upper bounds (in seconds) of the latency histogram buckets, from quick remote commands to long queue waits
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "healthcheck") -> None:
+        """
+        Counters and latency histograms for one process, rendered in the OpenMetrics text format.
+        Every sample carries the run-wide labels (image, os_type) and the operation of the current
+        log context, plus the labels given at the call site.
+        :param prefix: Prefix of every metric name.
+        """
+        self.prefix = prefix
+        self.labels: Dict[str, str] = {"image": "", "os_type": ""}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set_labels(self, **labels: Optional[str]) -> None:
+        """Sets run-wide labels such as the image name or the detected OS type."""
+        with self._lock:
+            self.labels.update({name: str(value) for name, value in labels.items() if value is not None})
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        merged = {**self.labels, "operation": current_operation(), **labels}
+        return tuple(sorted(merged.items()))
+
+    def inc(self, name: str, help_text: str = "", value: float = 1, **labels: str) -> None:
+        """Adds `value` to the counter `name` (without the _total suffix)."""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + value
+            self._help.setdefault(name, help_text)
+
+    def observe(self, name: str, seconds: float, help_text: str = "", **labels: str) -> None:
+        """Records a latency (in seconds) in the histogram `name`."""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            series.setdefault(self._key(labels), _Histogram()).observe(seconds)
+            self._help.setdefault(name, help_text)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                if self._help.get(name):
+                    lines.append(f"# HELP {metric} {self._help[name]}")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}_total{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                lines.append(f"# UNIT {metric} seconds")
+                if self._help.get(name):
+                    lines.append(f"# HELP {metric} {self._help[name]}")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(BUCKETS) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {histogram.total:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Writes the metrics as a textfile; the rename keeps collectors from reading a partial file."""
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(temporary, path)
+        logging.info(f"Metrics written to {path}")
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> http.server.ThreadingHTTPServer:
+        """Serves the metrics on http://address:port/metrics from a background thread."""
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = http.server.ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logging.info(f"Serving metrics on http://{address}:{port}/metrics")
+        return server
+
+
+# Process-wide registry the connection managers, executor and checkers record into
+metrics = MetricsRegistry()
+
+
+def record_connect(transport: str, seconds: float, outcome: str) -> None:
+    """Records one SSH or WinRM connection attempt, `outcome` being "ok" or the failure class."""
+    metrics.observe("connect_seconds", seconds, "Connection attempt latency", transport=transport, outcome=outcome)
+    metrics.inc("connect_attempts", "Connection attempts by outcome", transport=transport, outcome=outcome)
@@ -0,0 +1,95 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+class Profiler:
+    def __init__(self, enabled: bool = False, top: int = 30) -> None:
+        """
+        Optional cProfile run of a whole job with per-phase wall and CPU time, so slow runs can be
+        split into CPU work (crypto, rendering, parsing) and waiting on hosts or the cloud API.
+        Does nothing unless enabled.
+        :param enabled: Whether to profile at all.
+        :param top: Number of functions listed in the hot-function summary.
+        """
+        self.enabled = enabled
+        self.top = top
+        self.phases: Dict[str, List[float]] = {}
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, frame, event, arg) -> None:
+        # Runs once at the start of every new thread and hands it over to its own cProfile instance
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        if sys.version_info < (3, 12):
+            # Before 3.12 cProfile only sees the thread that enabled it, give every new thread its own
+            threading.setprofile(self._profile_thread)
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        self._profiles[0].disable()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Attributes the wall and process CPU time spent in the block to the named phase."""
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            # Background jobs (the clone in os_check.py) time their phases from another thread
+            with self._lock:
+                totals = self.phases.setdefault(name, [0.0, 0.0])
+                totals[0] += wall
+                totals[1] += cpu
+
+    def summary(self) -> str:
+        lines = [f"{'Phase':<24} {'Wall (s)':>10} {'CPU (s)':>10} {'Waiting (s)':>12}"]
+        with self._lock:
+            phases = {name: tuple(totals) for name, totals in self.phases.items()}
+            profiles = list(self._profiles)
+        for name, (wall, cpu) in phases.items():
+            lines.append(f"{name:<24} {wall:>10.2f} {cpu:>10.2f} {max(0.0, wall - cpu):>12.2f}")
+
+        stream = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=stream)
+        for sort, title in (("cumulative", "cumulative"), ("tottime", "own")):
+            stream.write(f"\nTop {self.top} functions by {title} time\n")
+            stats.sort_stats(sort).print_stats(self.top)
+        return "\n".join(lines) + "\n" + stream.getvalue()
+
+    def write(self, prefix: str) -> None:
+        """
+        Writes `<prefix>_profile.pstats` (for pstats, snakeviz and similar tools) and the
+        phase table plus hot-function summary as `<prefix>_profile.txt`.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            profiles = list(self._profiles)
+        pstats.Stats(*profiles).dump_stats(f"{prefix}_profile.pstats")
+        with open(f"{prefix}_profile.txt", "w", encoding="utf-8") as f:
+            f.write(self.summary())
+        logging.info(f"Profile written to {prefix}_profile.pstats and {prefix}_profile.txt")
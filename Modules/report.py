@@ -1,6 +1,8 @@
 from rich.console import Console
 from rich.table import Table
 from enum import Enum
+from typing import Iterable, Optional
+from .result import CheckResult
 
 class TableType(Enum):
     INSTALLER = 1
@@ -8,9 +10,12 @@ class TableType(Enum):
     OS = 3
 
 class ReportGenerator:
-    def __init__(self, app_or_os: TableType):
+    def __init__(self, app_or_os: TableType, dual_stack: bool = False, clone: bool = False, diagnose: bool = False):
         self.console = Console()
         self.app_or_os = app_or_os
+        self.dual_stack = dual_stack
+        self.clone = clone
+        self.diagnose = diagnose
         self.table = Table(show_header=True, header_style="bold red")
 
         # Set up tables for all types
@@ -22,23 +27,42 @@ class ReportGenerator:
             columns = ["Service Name", "Installed", "Enabled", "Listeners"]
         elif app_or_os == TableType.WEB:
             columns = ["Services Ports", "UFW V4 Ports", "UFW V6 Ports", "HTTP", "HTTPS"]
+            if self.dual_stack:
+                columns += ["HTTP V6", "HTTPS V6"]
+            if self.diagnose:
+                columns.append("Diagnosis")
         elif app_or_os == TableType.OS:
             columns = ["Rename", "Change Password", "Add IP", "Remove IP", "Add NIC", "Remove NIC", "Add HD", "Resize HD", "Remove HD"]
+            if self.clone:
+                columns += ["Clone", "Clone Connect"]
 
         for column in columns:
             self.table.add_column(column)
 
-    def add_installer_row(self, service_name: str, installed: str, enabled: str, listeners: list) -> None:
-        self.table.add_row(service_name, installed, enabled, ", ".join(listeners))
+    # Statuses may be Status members or their display strings, str() renders both
+    def add_installer_row(self, service_name: str, installed, enabled, listeners: list) -> None:
+        self.table.add_row(service_name, str(installed), str(enabled), ", ".join(listeners))
 
-    def add_web_row(self, port: str, v4_ports: list, v6_ports: list, http_status: str, https_status: str) -> None:
+    def add_web_row(self, port: str, v4_ports: list, v6_ports: list, http_status, https_status,
+                    http_v6_status=None, https_v6_status=None, diagnosis: Optional[str] = None) -> None:
         # Extract relevant V4 and V6 ports to avoid duplicating entries
         v4_port_display = v4_ports.pop(0) if v4_ports else None
         v6_port_display = v6_ports.pop(0) if v6_ports else None
-        self.table.add_row(str(port), v4_port_display, v6_port_display, http_status, https_status)
+        row = [str(port), v4_port_display, v6_port_display, str(http_status), str(https_status)]
+        if self.dual_stack:
+            # "-" when the host has no IPv6 address to probe
+            row += [str(status) if status is not None else "-" for status in (http_v6_status, https_v6_status)]
+        if self.diagnose:
+            row.append(diagnosis or "-")
+        self.table.add_row(*row)
 
-    def add_os_row(self, rename: str, change_password: str, add_ip: str, remove_ip: str, add_nic: str, remove_nic: str, add_hd: str, resize_hd: str, remove_hd: str) -> None:
-        self.table.add_row(rename, change_password, add_ip, remove_ip, add_nic, remove_nic, add_hd, resize_hd, remove_hd)
+    def add_os_row(self, rename, change_password, add_ip, remove_ip, add_nic, remove_nic, add_hd, resize_hd, remove_hd) -> None:
+        self.table.add_row(*(str(status) for status in (rename, change_password, add_ip, remove_ip, add_nic, remove_nic, add_hd, resize_hd, remove_hd)))
+
+    def add_os_results(self, results: Iterable[CheckResult]) -> None:
+        """Adds one row rendered from check records, matched to columns by check name."""
+        statuses = {result.check: str(result.status) for result in results}
+        self.table.add_row(*(statuses.get(column.header, "") for column in self.table.columns))
 
     def display_tables(self):
         self.console.print(self.table)
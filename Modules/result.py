@@ -0,0 +1,88 @@
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from .deadline import DeadlineExceeded
+
+class Status(Enum):
+    PASS = "✅"
+    FAIL = "❌"
+    TIMEOUT = "⌛"
+    UNREACHABLE = "⛔"
+
+    @classmethod
+    def from_bool(cls, value: bool) -> "Status":
+        return cls.PASS if value else cls.FAIL
+
+    @property
+    def ok(self) -> bool:
+        return self is Status.PASS
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class CheckResult:
+    """Outcome of a single check. Slotted so fleet-scale runs can hold many of them cheaply."""
+
+    __slots__ = ("check", "status", "duration", "host", "image", "detail")
+
+    def __init__(self, check: str, status: Status, duration: float = 0.0, host: Optional[str] = None,
+                 image: Optional[str] = None, detail: str = "") -> None:
+        self.check = check
+        self.status = status
+        self.duration = duration
+        self.host = host
+        self.image = image
+        self.detail = detail
+
+    @property
+    def ok(self) -> bool:
+        return self.status.ok
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "check": self.check,
+            "status": self.status.name,
+            "duration": round(self.duration, 3),
+            "host": self.host,
+            "image": self.image,
+            "detail": self.detail,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CheckResult":
+        return cls(data["check"], Status[data["status"]], data.get("duration", 0.0), data.get("host"),
+                   data.get("image"), data.get("detail", ""))
+
+    def __str__(self) -> str:
+        return str(self.status)
+
+    def __repr__(self) -> str:
+        return f"CheckResult({self.check!r}, {self.status.name}, {self.duration:.2f}s, host={self.host!r})"
+
+
+def timed_check(check: str, func: Callable[[], Any], host: Optional[str] = None, image: Optional[str] = None,
+                detail: str = "") -> CheckResult:
+    """
+    Runs func, converting a Status or bool outcome into a timed CheckResult.
+    A check cut off by the time budget becomes TIMEOUT instead of failing the whole run.
+    """
+    start = time.monotonic()
+    try:
+        outcome = func()
+    except (DeadlineExceeded, TimeoutError):
+        return CheckResult(check, Status.TIMEOUT, time.monotonic() - start, host, image, detail)
+    status = outcome if isinstance(outcome, Status) else Status.from_bool(bool(outcome))
+    return CheckResult(check, status, time.monotonic() - start, host, image, detail)
+
+
+def pivot(results: Iterable[CheckResult], row_key: str = "image", column_key: str = "check") -> Dict[Any, Dict[Any, Status]]:
+    """Groups results into {row: {column: status}}, e.g. images by check."""
+    table: Dict[Any, Dict[Any, Status]] = {}
+    for result in results:
+        table.setdefault(getattr(result, row_key), {})[getattr(result, column_key)] = result.status
+    return table
+
+
+def failures(results: Iterable[CheckResult]) -> List[CheckResult]:
+    return [result for result in results if not result.ok]
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+class ResultStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            image TEXT NOT NULL,
+            check_type TEXT NOT NULL,
+            check_name TEXT NOT NULL,
+            host TEXT NOT NULL,
+            definition_hash TEXT NOT NULL,
+            passed INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            row TEXT NOT NULL,
+            checked_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_key
+            ON results (image, check_type, check_name, host, checked_at);
+    """
+
+    def __init__(self, path: str = "results.db") -> None:
+        """
+        Opens (or creates) the SQLite result store.
+        :param path: Path of the SQLite database file.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def definition_hash(definition: Dict[str, Any]) -> str:
+        """Stable hash of an application/service definition from apps_services.json."""
+        return hashlib.sha256(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+    def record(self, image: str, check_type: str, check_name: str, host: str, definition_hash: str,
+               passed: bool, duration: float, row: List[Any]) -> None:
+        """Stores the outcome of a single check together with the report row it produced."""
+        self.conn.execute(
+            "INSERT INTO results (image, check_type, check_name, host, definition_hash, passed, duration, row, checked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (image, check_type, str(check_name), host, definition_hash, int(passed), duration, json.dumps(row), time.time()),
+        )
+        self.conn.commit()
+
+    def latest(self, image: str, check_type: str, check_name: str, host: str) -> Optional[sqlite3.Row]:
+        """Returns the most recent result for the given key, or None if it was never checked."""
+        return self.conn.execute(
+            "SELECT * FROM results WHERE image = ? AND check_type = ? AND check_name = ? AND host = ? "
+            "ORDER BY checked_at DESC LIMIT 1",
+            (image, check_type, str(check_name), host),
+        ).fetchone()
+
+    def cached_row(self, image: str, check_type: str, check_name: str, host: str, definition_hash: str,
+                   ttl: int) -> Optional[List[Any]]:
+        """
+        Returns the stored report row if the last result can be reused, i.e. it passed,
+        its definition is unchanged and it is younger than the TTL. Otherwise returns None.
+        """
+        last = self.latest(image, check_type, check_name, host)
+        if last is None or not last["passed"] or last["definition_hash"] != definition_hash:
+            return None
+        if time.time() - last["checked_at"] > ttl:
+            return None
+        return json.loads(last["row"])
+
+    def pass_rate(self, image: str, since: Optional[float] = None) -> Dict[str, float]:
+        """Returns the pass rate per check type for an image, optionally since a UNIX timestamp."""
+        rows = self.conn.execute(
+            "SELECT check_type, AVG(passed) AS rate FROM results WHERE image = ? AND checked_at >= ? GROUP BY check_type",
+            (image, since or 0),
+        ).fetchall()
+        return {row["check_type"]: row["rate"] for row in rows}
+
+    def latency_trend(self, image: str, check_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the average and maximum check duration per day for an image, oldest first."""
+        query = ("SELECT date(checked_at, 'unixepoch') AS day, check_type, COUNT(*) AS runs, "
+                 "AVG(duration) AS avg_duration, MAX(duration) AS max_duration FROM results WHERE image = ?")
+        params: List[Any] = [image]
+        if check_type:
+            query += " AND check_type = ?"
+            params.append(check_type)
+        query += " GROUP BY day, check_type ORDER BY day"
+        return [dict(row) for row in self.conn.execute(query, params).fetchall()]
+
+    def close(self) -> None:
+        self.conn.close()
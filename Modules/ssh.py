@@ -1,10 +1,19 @@
+import copy
 import paramiko
 import logging
+import socket
 import time
-from typing import Optional
+from typing import Optional, Tuple
+from .circuit import CircuitBreaker, FailureKind, default_breaker
+from .deadline import Deadline
+from .metrics import metrics, record_connect
+from .ssh_profile import ConnectionProfile, default_profile
+from .ssh_stream import CommandStream
 
 class SSHManager:
-    def __init__(self, host: str, user: str, password: str, retries: int = 10, retry_timeout: int = 10) -> None:
+    def __init__(self, host: str, user: str, password: str, retries: int = 10, retry_timeout: int = 10,
+                 broker_socket: Optional[str] = None, deadline: Optional[Deadline] = None,
+                 breaker: Optional[CircuitBreaker] = None, profile: Optional[ConnectionProfile] = None) -> None:
         """
         Initializes the SSHManager and tries to establish a connection to the host.
         :param host: The hostname or IP of the server.
@@ -12,28 +21,102 @@ class SSHManager:
         :param password: The password for SSH.
         :param retries: Number of retries for connection attempts.
         :param retry_timeout: Time (in seconds) to wait between retries.
+        :param broker_socket: Optional path of a running SSH broker; commands run over its cached transport.
+        :param deadline: Optional time budget bounding connection attempts and remote commands.
+        :param breaker: Circuit breaker refusing attempts to hosts that keep failing; shared per process by default.
+        :param profile: Host-key cache, algorithm and authentication settings; shared per process by default.
         """
+        self.client = None
+        self.broker = None
+        self.deadline = deadline or Deadline()
+        self.breaker = breaker or default_breaker
+        self.profile = profile or default_profile
+        # Classification of the last failed connection attempt
+        self.failure: Optional[FailureKind] = None
+        if self.breaker.blocked(host):
+            logging.error(f"Not connecting to {host}, {self.breaker.describe(host)}.")
+            return
+        if broker_socket:
+            from .ssh_broker import BrokerClient
+            broker = BrokerClient(broker_socket, host, user, password, timeout=self.deadline.timeout(None))
+            if broker.connect():
+                logging.info(f"Using brokered connection to {host}.")
+                self.broker = broker
+                return
+            logging.warning("Falling back to a direct SSH connection.")
         self.client = self._create_client(host, user, password, retries, retry_timeout)
 
     def _create_client(self, host: str, user: str, password: str, retries: int, retry_timeout: int) -> Optional[paramiko.SSHClient]:
         client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.profile.prepare(client, host)
+        host_key_replaced = False
 
-        for attempt in range(1, retries + 1):
+        # The host-key replacement and the algorithm fallback retry at once, without using up an attempt
+        attempt, asked = 1, 0
+        while attempt <= retries:
+            if self.deadline.expired():
+                logging.error(f"Time budget exhausted after {attempt - 1} attempts. Could not connect to {host}.")
+                return None
+            # Asked once per attempt: in the half-open state the breaker hands out a single trial
+            if attempt > asked and not self.breaker.allow(host):
+                logging.error(f"Giving up on {host} after {attempt - 1} attempts, {self.breaker.describe(host)}.")
+                return None
+            asked = attempt
+            started = time.monotonic()
             try:
                 logging.info(f"Attempt {attempt} to connect to {host}...")
-                client.connect(host, username=user, password=password, allow_agent=False, look_for_keys=False)
+                timeout = self.deadline.timeout(None)
+                # The TCP connect is made here so it can be timed apart from the SSH handshake
+                sock = socket.create_connection((host, 22), timeout=timeout)
+                connected = time.monotonic()
+                try:
+                    client.connect(host, username=user, password=password, sock=sock, timeout=timeout,
+                                   banner_timeout=timeout, auth_timeout=timeout, **self.profile.connect_kwargs(host))
+                except BaseException:
+                    sock.close()
+                    raise
                 logging.info("Connected successfully.")
+                self.profile.record_handshake(host, client.get_transport(), connected - started, time.monotonic() - connected)
+                self.breaker.record_success(host)
+                record_connect("ssh", time.monotonic() - started, "ok")
                 return client
             except Exception as e:
-                logging.warning(f"Attempt {attempt} failed: {e}")
-                if attempt < retries:
-                    logging.info(f"Retrying in {retry_timeout} seconds...")
-                    time.sleep(retry_timeout)
+                if isinstance(e, paramiko.BadHostKeyException) and not host_key_replaced:
+                    # Cloud addresses are reused, a re-created server presents a new key on the same IP
+                    logging.warning(f"Host key of {host} changed, replacing the cached key: {e}")
+                    host_key_replaced = True
+                    self.profile.forget(host)
+                    client = paramiko.SSHClient()
+                    self.profile.prepare(client, host)
+                    continue
+                if "incompatible" in str(e).lower() and not self.profile.uses_defaults(host):
+                    logging.warning(f"{host} supports none of the profile's algorithms, offering the defaults: {e}")
+                    self.profile.fall_back(host)
+                    continue
+                self.failure = self.breaker.record_failure(host, e)
+                record_connect("ssh", time.monotonic() - started, self.failure.value)
+                logging.warning(f"Attempt {attempt} failed ({self.failure.value}): {e}")
+                attempt += 1
+                if attempt <= retries and self.breaker.blocked(host):
+                    continue
+                if attempt <= retries:
+                    metrics.inc("connect_retries", "Connection attempts retried after a failure", transport="ssh")
+                    delay = self.deadline.timeout(retry_timeout)
+                    logging.info(f"Retrying in {delay:.0f} seconds...")
+                    time.sleep(delay)
                 else:
                     logging.error(f"All {retries} attempts failed. Could not connect to {host}.")
                     return None
 
+    def with_deadline(self, deadline: Deadline) -> "SSHManager":
+        """
+        Returns a view sharing this connection whose remote commands are bounded by another deadline,
+        e.g. one task's budget on a pooled connection. The view is not closed on its own.
+        """
+        view = copy.copy(self)
+        view.deadline = deadline
+        return view
+
     def close(self):
         """
         Closes the SSH connection if it is open.
@@ -41,6 +124,9 @@ class SSHManager:
         if self.client:
             self.client.close()
             logging.info("Connection closed.")
+        elif self.broker:
+            # The broker keeps the transport alive for the next process
+            logging.info("Brokered connection released.")
 
     def exec_command(self, command: str) -> str:
         """
@@ -48,18 +134,57 @@ class SSHManager:
         :param command: The command to execute.
         :return: The output of the command as a string.
         """
+        stdout_output, stderr_output, _ = self.exec_raw(command)
+        if stderr_output:
+            logging.error(f"Error: {stderr_output}")
+        return stdout_output
+
+    def exec_raw(self, command: str) -> Tuple[str, str, Optional[int]]:
+        """
+        Executes a command on the remote server without logging its errors.
+        :param command: The command to execute.
+        :return: A tuple of (stdout, stderr, exit status).
+        """
+        started = time.monotonic()
+        exit_status = None
+        try:
+            if self.broker:
+                self.deadline.check(f"running '{command}'")
+                stdout_output, stderr_output, exit_status = self.broker.exec_command(command, timeout=self.deadline.timeout(None))
+                return stdout_output, stderr_output, exit_status
+            stream = self.exec_stream(command)
+            stdout_output = "\n".join(stream).strip()
+            exit_status = stream.exit_status
+            return stdout_output, stream.stderr, exit_status
+        finally:
+            metrics.observe("remote_command_seconds", time.monotonic() - started, "Remote command latency",
+                            transport="ssh", outcome="ok" if exit_status == 0 else "error")
+
+    def exec_stream(self, command: str, max_bytes: Optional[int] = None) -> CommandStream:
+        """
+        Executes a command and returns a stream yielding its stdout lines lazily.
+        stdout and stderr are drained concurrently; the exit status is available
+        on the stream once it has been consumed.
+        :param command: The command to execute.
+        :param max_bytes: Optional cap on the stdout bytes kept in memory.
+        :return: A CommandStream over the command output.
+        """
+        self.deadline.check(f"running '{command}'")
+        if self.broker:
+            stdout_output, stderr_output, exit_status = self.broker.exec_command(command, timeout=self.deadline.timeout(None))
+            return CommandStream.from_output(stdout_output, stderr_output, exit_status)
         if self.client is None:
             raise ConnectionError("SSH client is not connected.")
 
-        _, stdout, stderr = self.client.exec_command(command)
-        stderr_output = stderr.read().decode()
-        if stderr_output:
-            logging.error(f"Error: {stderr_output}")
-        return stdout.read().decode().strip()
+        timeout = self.deadline.timeout(None)
+        channel = self.client.get_transport().open_session(timeout=timeout)
+        channel.settimeout(timeout)
+        channel.exec_command(command)
+        return CommandStream(channel, max_bytes=max_bytes, deadline=self.deadline)
 
     def is_connected(self) -> bool:
         """
         Checks if the SSH connection is active.
         :return: True if connected, False otherwise.
         """
-        return self.client is not None
+        return self.client is not None or self.broker is not None
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+DEFAULT_SOCKET = "/tmp/os-apps-ssh-broker.sock"
+
+
+def _password_digest(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class _BrokerEntry:
+    def __init__(self, manager, digest: str):
+        self.manager = manager
+        self.digest = digest
+        self.last_used = time.monotonic()
+
+
+class SSHBroker:
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, idle_timeout: int = 300) -> None:
+        """
+        Keeps authenticated SSH transports alive per (host, user) and executes
+        commands on behalf of short-lived processes connecting over a local socket.
+        :param socket_path: Path of the Unix socket to listen on.
+        :param idle_timeout: Time (in seconds) after which an unused transport is closed.
+        """
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.entries: Dict[Tuple[str, str], _BrokerEntry] = {}
+        self.lock = threading.Lock()
+        # Per (host, user) lock held while a transport is being opened
+        self.connecting: Dict[Tuple[str, str], threading.Lock] = {}
+        self.server = None
+
+    def _is_alive(self, entry: _BrokerEntry) -> bool:
+        client = entry.manager.client
+        transport = client.get_transport() if client else None
+        return transport is not None and transport.is_active()
+
+    def _get_manager(self, host: str, user: str, password: str):
+        """Returns a live SSHManager for (host, user), connecting if needed."""
+        from .ssh import SSHManager
+
+        key = (host, user)
+        digest = _password_digest(password)
+        with self.lock:
+            connecting = self.connecting.setdefault(key, threading.Lock())
+        # Concurrent requests for the same host wait for one connection instead of opening their own
+        with connecting:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry.digest == digest and self._is_alive(entry):
+                    entry.last_used = time.monotonic()
+                    return entry.manager
+
+            logging.info(f"Broker opening transport to {user}@{host}")
+            manager = SSHManager(host, user, password)
+            if not manager.is_connected():
+                return None
+
+            with self.lock:
+                stale = self.entries.get(key)
+                self.entries[key] = _BrokerEntry(manager, digest)
+        if stale:
+            stale.manager.close()
+        return manager
+
+    def _drop(self, host: str, user: str) -> None:
+        with self.lock:
+            entry = self.entries.pop((host, user), None)
+        if entry:
+            entry.manager.close()
+
+    def handle_request(self, request: dict) -> dict:
+        """Handles a single decoded request and returns the response to send back."""
+        op = request.get("op")
+        host, user, password = request.get("host"), request.get("user"), request.get("password", "")
+
+        if op == "close":
+            self._drop(host, user)
+            return {"ok": True}
+
+        manager = self._get_manager(host, user, password)
+        if manager is None:
+            return {"ok": False, "error": f"Could not connect to {host}"}
+        if op == "connect":
+            return {"ok": True}
+        if op != "exec":
+            return {"ok": False, "error": f"Unknown operation: {op}"}
+
+        # A transport can die between the liveness check and the exec, retry once on a fresh one
+        for attempt in range(2):
+            try:
+                output, error, exit_status = manager.exec_raw(request.get("command", ""))
+                return {"ok": True, "output": output, "stderr": error, "exit_status": exit_status}
+            except Exception as e:
+                logging.warning(f"Broker exec on {host} failed: {e}")
+                self._drop(host, user)
+                if attempt == 0:
+                    manager = self._get_manager(host, user, password)
+                    if manager is None:
+                        break
+        return {"ok": False, "error": f"Command execution failed on {host}"}
+
+    def evict_idle(self) -> None:
+        """Closes transports that were not used within the idle timeout."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [key for key, entry in self.entries.items()
+                       if now - entry.last_used > self.idle_timeout or not self._is_alive(entry)]
+            evicted = [self.entries.pop(key) for key in expired]
+        for (host, user), entry in zip(expired, evicted):
+            logging.info(f"Evicting idle transport to {user}@{host}")
+            entry.manager.close()
+
+    def _eviction_loop(self) -> None:
+        interval = max(1, self.idle_timeout // 4)
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def serve_forever(self) -> None:
+        """Starts listening on the Unix socket until interrupted."""
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = broker.handle_request(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        response = {"ok": False, "error": f"Invalid request: {e}"}
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        # Requests carry credentials, only the owning user may talk to the broker
+        os.chmod(self.socket_path, 0o600)
+
+        threading.Thread(target=self._eviction_loop, daemon=True).start()
+        logging.info(f"SSH broker listening on {self.socket_path} (idle timeout {self.idle_timeout}s)")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.unlink(self.socket_path)
+            with self.lock:
+                entries = list(self.entries.values())
+                self.entries.clear()
+            for entry in entries:
+                entry.manager.close()
+
+
+class BrokerClient:
+    def __init__(self, socket_path: str, host: str, user: str, password: str, timeout: Optional[float] = None) -> None:
+        """
+        Talks to a running SSHBroker on behalf of an SSHManager.
+        :param socket_path: Path of the broker Unix socket.
+        :param timeout: Socket timeout (in seconds) for broker requests.
+        """
+        self.socket_path = socket_path
+        self.host = host
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+
+    def _request(self, op: str, timeout: Optional[float] = None, **fields) -> dict:
+        payload = {"op": op, "host": self.host, "user": self.user, "password": self.password, **fields}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout if timeout is not None else self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(payload) + "\n").encode())
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("SSH broker closed the connection without a response.")
+        return json.loads(line)
+
+    def connect(self) -> bool:
+        """Asks the broker to establish (or reuse) the transport. Returns False if the broker is unreachable."""
+        try:
+            response = self._request("connect")
+        except (OSError, ValueError) as e:
+            logging.warning(f"SSH broker at {self.socket_path} unavailable: {e}")
+            return False
+        if not response.get("ok"):
+            logging.warning(f"SSH broker could not connect to {self.host}: {response.get('error')}")
+        return bool(response.get("ok"))
+
+    def exec_command(self, command: str, timeout: Optional[float] = None) -> Tuple[str, str, Optional[int]]:
+        """Runs a command over the brokered transport and returns (stdout, stderr, exit status)."""
+        response = self._request("exec", timeout=timeout, command=command)
+        if not response.get("ok"):
+            raise ConnectionError(response.get("error", "SSH broker request failed."))
+        return response.get("output", ""), response.get("stderr", ""), response.get("exit_status")
+
+    def release(self) -> None:
+        """Asks the broker to drop the transport, e.g. after the credentials changed."""
+        try:
+            self._request("close")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to release brokered connection to {self.host}: {e}")
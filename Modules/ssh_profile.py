@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import paramiko
+from .metrics import metrics
+
+DEFAULT_KNOWN_HOSTS = os.path.expanduser("~/.cache/os-apps-health-check/known_hosts")
+
+# Candidates tried by the benchmark, the faster elliptic-curve exchanges and AES modes first
+BENCHMARK_KEX = ["curve25519-sha256@libssh.org", "ecdh-sha2-nistp256", "diffie-hellman-group14-sha256",
+                 "diffie-hellman-group16-sha512", "diffie-hellman-group-exchange-sha256"]
+BENCHMARK_CIPHERS = ["aes128-gcm@openssh.com", "aes256-gcm@openssh.com", "aes128-ctr", "aes256-ctr"]
+# Representative read of the checks, so compression is measured on real output
+BENCHMARK_COMMAND = "dpkg -l 2>/dev/null || rpm -qa"
+
+
+class _CachingPolicy(paramiko.MissingHostKeyPolicy):
+    """Accepts the key of an unknown host like AutoAddPolicy and stores it in the profile's cache."""
+
+    def __init__(self, profile: "ConnectionProfile") -> None:
+        self.profile = profile
+
+    def missing_host_key(self, client: paramiko.SSHClient, hostname: str, key: paramiko.PKey) -> None:
+        client.get_host_keys().add(hostname, key.get_name(), key)
+        self.profile.remember(hostname, key)
+
+
+class ConnectionProfile:
+    def __init__(self, kex: Optional[List[str]] = None, ciphers: Optional[List[str]] = None,
+                 compression: bool = False, key_filename: Optional[str] = None,
+                 known_hosts: Optional[str] = DEFAULT_KNOWN_HOSTS) -> None:
+        """
+        How SSHManager negotiates its connections: cached host keys, the key exchange and cipher
+        algorithms it offers, compression and the authentication order. Also keeps the handshake
+        timings of the process.
+        :param kex: Key exchange algorithms to offer, None for paramiko's defaults.
+        :param ciphers: Ciphers to offer, None for paramiko's defaults.
+        :param compression: Whether to request zlib compression.
+        :param key_filename: Optional private key tried before the password.
+        :param known_hosts: Host-key cache file, None to accept every key without caching.
+        """
+        self.kex = kex
+        self.ciphers = ciphers
+        self.compression = compression
+        self.key_filename = key_filename
+        self.known_hosts = known_hosts
+        self.handshakes: List[Tuple[float, float]] = []
+        # Hosts that rejected the restricted algorithms and are offered the defaults instead
+        self._fallback = set()
+        self._host_keys: Optional[paramiko.HostKeys] = None
+        self._lock = threading.Lock()
+
+    def configure(self, path: Optional[str] = None, key_filename: Optional[str] = None) -> "ConnectionProfile":
+        """
+        Loads the settings of a JSON profile (as written by the benchmark) into this profile.
+        :param path: Optional profile file with kex, ciphers, compression, key_filename and known_hosts.
+        :param key_filename: Optional private key, overriding the file's.
+        """
+        if path:
+            with open(path, encoding="utf-8") as f:
+                settings = json.load(f)
+            self.kex = settings.get("kex", self.kex)
+            self.ciphers = settings.get("ciphers", self.ciphers)
+            self.compression = settings.get("compression", self.compression)
+            self.key_filename = settings.get("key_filename", self.key_filename)
+            self.known_hosts = settings.get("known_hosts", self.known_hosts)
+            logging.info(f"Using SSH profile {path}: kex {self.kex or 'default'}, ciphers {self.ciphers or 'default'}, "
+                         f"compression {'on' if self.compression else 'off'}")
+        if key_filename:
+            self.key_filename = key_filename
+        return self
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"kex": self.kex, "ciphers": self.ciphers, "compression": self.compression,
+                       "key_filename": self.key_filename, "known_hosts": self.known_hosts}, f, indent=2)
+        logging.info(f"SSH profile written to {path}")
+
+    def _cached_keys(self) -> paramiko.HostKeys:
+        if self._host_keys is None:
+            self._host_keys = paramiko.HostKeys()
+            if self.known_hosts and os.path.exists(self.known_hosts):
+                try:
+                    self._host_keys.load(self.known_hosts)
+                except (IOError, paramiko.SSHException) as e:
+                    logging.warning(f"Ignoring unreadable host-key cache {self.known_hosts}: {e}")
+        return self._host_keys
+
+    def prepare(self, client: paramiko.SSHClient, host: str) -> None:
+        """
+        Seeds the client with the cached keys of the host, so paramiko verifies them and
+        negotiates the host-key type it already knows, and caches keys it has not seen yet.
+        """
+        if not self.known_hosts:
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            return
+        with self._lock:
+            for keytype, key in (self._cached_keys().lookup(host) or {}).items():
+                client.get_host_keys().add(host, keytype, key)
+        client.set_missing_host_key_policy(_CachingPolicy(self))
+
+    def _store(self, update) -> None:
+        # Merges into the file's current contents, so parallel processes only lose a cache entry at worst
+        directory = os.path.dirname(self.known_hosts)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        on_disk = paramiko.HostKeys()
+        if os.path.exists(self.known_hosts):
+            on_disk.load(self.known_hosts)
+        update(on_disk)
+        temporary = f"{self.known_hosts}.{os.getpid()}.tmp"
+        on_disk.save(temporary)
+        os.replace(temporary, self.known_hosts)
+
+    def remember(self, host: str, key: paramiko.PKey) -> None:
+        with self._lock:
+            self._cached_keys().add(host, key.get_name(), key)
+            try:
+                self._store(lambda keys: keys.add(host, key.get_name(), key))
+            except (IOError, paramiko.SSHException) as e:
+                logging.warning(f"Could not update host-key cache {self.known_hosts}: {e}")
+
+    def forget(self, host: str) -> None:
+        """Drops the cached keys of a host, e.g. after it was re-created on the same address."""
+        with self._lock:
+            self._cached_keys().pop(host, None)
+            try:
+                self._store(lambda keys: keys.pop(host, None))
+            except (IOError, paramiko.SSHException) as e:
+                logging.warning(f"Could not update host-key cache {self.known_hosts}: {e}")
+
+    def fall_back(self, host: str) -> None:
+        """Offers paramiko's default algorithms to a host that supports none of the profile's."""
+        with self._lock:
+            self._fallback.add(host)
+
+    def uses_defaults(self, host: str) -> bool:
+        with self._lock:
+            return host in self._fallback
+
+    def connect_kwargs(self, host: str) -> Dict:
+        """Keyword arguments for SSHClient.connect implementing the profile."""
+        kwargs = {"compress": self.compression, "allow_agent": False, "look_for_keys": False}
+        if self.key_filename:
+            # paramiko tries the key before the password
+            kwargs["key_filename"] = self.key_filename
+        if self.uses_defaults(host):
+            return kwargs
+        # paramiko only takes a deny list, so everything outside the profile is disabled
+        disabled = {}
+        for kind, offered, supported in (("kex", self.kex, paramiko.Transport._preferred_kex),
+                                         ("ciphers", self.ciphers, paramiko.Transport._preferred_ciphers)):
+            if offered:
+                disabled[kind] = [name for name in supported if name not in offered]
+        if disabled:
+            kwargs["disabled_algorithms"] = disabled
+        return kwargs
+
+    def record_handshake(self, host: str, transport: Optional[paramiko.Transport], tcp: float, handshake: float) -> None:
+        """Records the TCP connect and the SSH handshake (key exchange and authentication) times."""
+        with self._lock:
+            self.handshakes.append((tcp, handshake))
+        metrics.observe("ssh_handshake_seconds", tcp, "SSH connection setup time", phase="tcp")
+        metrics.observe("ssh_handshake_seconds", handshake, "SSH connection setup time", phase="ssh")
+        if transport:
+            logging.debug(f"Connected to {host} in {tcp + handshake:.2f}s (tcp {tcp:.2f}s, ssh {handshake:.2f}s), "
+                          f"cipher {transport.local_cipher}, compression {transport.local_compression}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            totals = [tcp + handshake for tcp, handshake in self.handshakes]
+            ssh = [handshake for _, handshake in self.handshakes]
+        if not totals:
+            return {"handshakes": 0}
+        return {
+            "handshakes": len(totals),
+            "total_seconds": round(sum(totals), 3),
+            "mean_seconds": round(statistics.mean(totals), 3),
+            "mean_ssh_seconds": round(statistics.mean(ssh), 3),
+            "max_seconds": round(max(totals), 3),
+        }
+
+
+# Used by every SSHManager that is not given its own; the entry points configure it from --ssh-profile
+default_profile = ConnectionProfile()
+
+
+def benchmark(host: str, user: str, password: str, rounds: int = 3,
+              kex: Optional[List[str]] = None, ciphers: Optional[List[str]] = None) -> List[Tuple[str, str, bool, float]]:
+    """
+    Connects with every supported kex/cipher/compression combination and runs a typical read.
+    :return: (kex, cipher, compression, mean seconds) per combination that worked, fastest first.
+    """
+    from .circuit import CircuitBreaker
+    from .ssh import SSHManager
+
+    supported_kex = [name for name in kex or BENCHMARK_KEX if name in paramiko.Transport._preferred_kex]
+    supported_ciphers = [name for name in ciphers or BENCHMARK_CIPHERS if name in paramiko.Transport._preferred_ciphers]
+    results = []
+    for kex_name in supported_kex:
+        for cipher in supported_ciphers:
+            for compression in (False, True):
+                profile = ConnectionProfile([kex_name], [cipher], compression, known_hosts=default_profile.known_hosts)
+                timings = []
+                for _ in range(rounds):
+                    started = time.monotonic()
+                    # A private breaker, so rejected combinations do not open the shared circuit
+                    manager = SSHManager(host, user, password, retries=1, profile=profile, breaker=CircuitBreaker())
+                    if not manager.is_connected() or profile.uses_defaults(host):
+                        manager.close()
+                        break
+                    manager.exec_command(BENCHMARK_COMMAND)
+                    manager.close()
+                    timings.append(time.monotonic() - started)
+                if len(timings) == rounds:
+                    results.append((kex_name, cipher, compression, statistics.mean(timings)))
+                    logging.info(f"{kex_name} / {cipher} / compression {'on' if compression else 'off'}: "
+                                 f"{results[-1][3]:.3f}s")
+                else:
+                    logging.info(f"{kex_name} / {cipher} not accepted by {host}, skipped")
+    return sorted(results, key=lambda result: result[3])
@@ -0,0 +1,94 @@
+import select
+from typing import Iterator, List, Optional
+from .deadline import Deadline
+
+class CommandStream:
+    CHUNK_SIZE = 32768
+
+    def __init__(self, channel, max_bytes: Optional[int] = None, max_stderr_bytes: int = 65536,
+                 deadline: Optional[Deadline] = None) -> None:
+        """
+        Streams the output of a remote command, draining stdout and stderr concurrently
+        so a full stderr window can never stall stdout (or the other way around).
+        :param channel: The paramiko channel the command was started on.
+        :param max_bytes: Optional cap on stdout bytes kept; the rest is drained and discarded.
+        :param max_stderr_bytes: Cap on stderr bytes kept.
+        :param deadline: Optional time budget; DeadlineExceeded is raised when it runs out.
+        """
+        self.channel = channel
+        self.max_bytes = max_bytes
+        self.max_stderr_bytes = max_stderr_bytes
+        self.deadline = deadline or Deadline()
+        self.truncated = False
+        self._stderr = bytearray()
+        self._stdout_bytes = 0
+        self._exit_status: Optional[int] = None
+        self._consumed = False
+
+    @classmethod
+    def from_output(cls, stdout: str, stderr: str, exit_status: int) -> "CommandStream":
+        """Wraps output that was already fetched (e.g. through the SSH broker) in the same interface."""
+        stream = cls(None)
+        stream._buffered = stdout.splitlines()
+        stream._stderr = bytearray(stderr.encode())
+        stream._exit_status = exit_status
+        return stream
+
+    def _keep_stderr(self, data: bytes) -> None:
+        room = self.max_stderr_bytes - len(self._stderr)
+        if room > 0:
+            self._stderr += data[:room]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._consumed:
+            raise RuntimeError("Command output can only be iterated once.")
+        self._consumed = True
+        if self.channel is None:
+            yield from self._buffered
+            return
+
+        channel = self.channel
+        partial = b""
+        try:
+            while True:
+                self.deadline.check("reading command output")
+                progressed = False
+                if channel.recv_stderr_ready():
+                    self._keep_stderr(channel.recv_stderr(self.CHUNK_SIZE))
+                    progressed = True
+                if channel.recv_ready():
+                    data = channel.recv(self.CHUNK_SIZE)
+                    progressed = True
+                    if self.max_bytes is not None and self._stdout_bytes + len(data) > self.max_bytes:
+                        data = data[:max(0, self.max_bytes - self._stdout_bytes)]
+                        self.truncated = True
+                    self._stdout_bytes += len(data)
+                    if data:
+                        lines = (partial + data).split(b"\n")
+                        partial = lines.pop()
+                        for line in lines:
+                            yield line.decode(errors="replace")
+                # Messages are processed in order, so once the exit status is in both buffers are complete
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if not progressed:
+                    # stdout readiness wakes select, stderr is picked up on the next short tick
+                    select.select([channel], [], [], self.deadline.timeout(0.1))
+            if partial:
+                yield partial.decode(errors="replace")
+            self._exit_status = channel.recv_exit_status()
+        finally:
+            channel.close()
+
+    def lines(self) -> List[str]:
+        """Consumes the whole stream and returns its stdout lines."""
+        return list(self)
+
+    @property
+    def stderr(self) -> str:
+        return self._stderr.decode(errors="replace")
+
+    @property
+    def exit_status(self) -> Optional[int]:
+        """Exit status of the remote command, or None if the stream was not fully consumed."""
+        return self._exit_status
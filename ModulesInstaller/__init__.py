@@ -1,12 +1,17 @@
 from .config_parser import parse_config_args
-from .json_loader import load_app_config
+from .json_loader import load_app_config, load_catalog
 from .service_check import ServiceChecker
+from .monitor import ServiceMonitor
+from .catalog import validate_catalog
 
 __version__ = "1.0.0"
 
 __all__ = [
     "parse_config_args",
     "load_app_config",
+    "load_catalog",
     "ServiceChecker",
+    "ServiceMonitor",
+    "validate_catalog",
 ]
 
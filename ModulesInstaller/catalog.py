@@ -0,0 +1,164 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+from Modules.ssh import SSHManager
+from Modules.command_cache import CommandCache
+from Modules.deadline import Deadline
+from Modules.log import forward_logging, log_context, relay_logging
+from Modules.result import CheckResult, Status
+from .service_check import ServiceChecker
+
+class RowCollector:
+    """Picklable stand-in for ReportGenerator that keeps the rows a worker produced."""
+
+    def __init__(self):
+        self.installer_rows: List[list] = []
+        self.web_rows: List[list] = []
+
+    def add_installer_row(self, service_name: str, installed: str, enabled: str, listeners: list) -> None:
+        self.installer_rows.append([service_name, installed, enabled, listeners])
+
+    def add_web_row(self, port: str, v4_ports: list, v6_ports: list, http_status: str, https_status: str) -> None:
+        v4_port_display = v4_ports.pop(0) if v4_ports else None
+        v6_port_display = v6_ports.pop(0) if v6_ports else None
+        self.web_rows.append([port, v4_port_display, v6_port_display, http_status, https_status])
+
+
+def _check_app(app: Dict[str, Any], target: Dict[str, str], pool: Dict[tuple, SSHManager],
+               pool_lock: threading.Lock, probe_workers: int, deadline: Deadline,
+               run_deadline: Deadline, cache: CommandCache) -> Dict[str, Any]:
+    if deadline.expired():
+        return {"error": "Time budget exhausted before checking"}
+    key = (target["host"], target["user"])
+    with pool_lock:
+        ssh_manager = pool.get(key)
+    if ssh_manager is None or not ssh_manager.is_connected():
+        ssh_manager = SSHManager(target["host"], target["user"], target["password"],
+                                 broker_socket=target.get("broker_socket"), deadline=deadline)
+        if not ssh_manager.is_connected():
+            reason = f" ({ssh_manager.failure.value})" if ssh_manager.failure else ""
+            return {"error": f"SSH connection to {target['host']} failed{reason}"}
+        # Pooled connections outlive this application, only the run deadline applies to them
+        ssh_manager.deadline = run_deadline
+        with pool_lock:
+            pooled = pool.get(key)
+            if pooled is not None and pooled.is_connected():
+                # Another thread connected to the same host meanwhile, keep its connection and drop ours
+                ssh_manager, duplicate = pooled, ssh_manager
+            else:
+                pool[key], duplicate = ssh_manager, None
+        if duplicate:
+            duplicate.close()
+        else:
+            cache.invalidate(target["host"])
+
+    # The application's budget bounds its commands without touching the manager other threads share
+    service_checker = ServiceChecker(ssh_manager.with_deadline(deadline), deadline, host=target["host"],
+                                     image=app["name"], cache=cache)
+    collector = RowCollector()
+    records: List[CheckResult] = []
+    services = app.get("services", [])
+    ports = [port_info["port"] for service in services for port_info in service.get("ports", []) if port_info.get("port")]
+
+    # Web probes only need the host, start them while the SSH-side checks run
+    with ThreadPoolExecutor(max_workers=probe_workers) as probes:
+        futures = {port: probes.submit(service_checker.check_web_access, target["host"], [port]) for port in set(ports)}
+        for service in services:
+            records.extend(service_checker.process_service(service, collector))
+        v4_ports = service_checker.check_open_ports_v4()
+        v6_ports = service_checker.check_open_ports_v6()
+        for port in ports:
+            connectivity = futures[port].result().get(port, {})
+            http_status, https_status = connectivity.get("http", Status.FAIL), connectivity.get("https", Status.FAIL)
+            records.append(CheckResult(f"http:{port}", http_status, host=target["host"], image=app["name"]))
+            records.append(CheckResult(f"https:{port}", https_status, host=target["host"], image=app["name"]))
+            collector.add_web_row(port, v4_ports, v6_ports, http_status, https_status)
+
+    return {"installer": collector.installer_rows, "web": collector.web_rows, "records": records}
+
+
+def check_shard(shard: int, apps: List[Dict[str, Any]], targets: Dict[str, Dict[str, str]],
+                progress, threads: int = 4, probe_workers: int = 8, run_deadline: Optional[Deadline] = None,
+                host_budget: Optional[float] = None, log_queue=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Worker entry point: checks one shard of the catalog with its own SSH connection pool.
+    Progress events are pushed to the shared queue as (shard, done, total, image).
+    Each application gets `host_budget` seconds, never outliving the run deadline.
+    Log records are forwarded to the parent through `log_queue` when given.
+    """
+    if log_queue is not None:
+        forward_logging(log_queue)
+    run_deadline = run_deadline or Deadline()
+    pool: Dict[tuple, SSHManager] = {}
+    pool_lock = threading.Lock()
+    # Applications sharing a host also share the outputs of read-only commands such as the firewall listing
+    cache = CommandCache()
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # The per-host budget starts when the application is picked up, not when it is queued
+        def check(app: Dict[str, Any]) -> Dict[str, Any]:
+            with log_context(host=targets[app["name"]]["host"], op=app["name"]):
+                return _check_app(app, targets[app["name"]], pool, pool_lock, probe_workers,
+                                  run_deadline.child(host_budget), run_deadline, cache)
+        futures = {executor.submit(check, app): app["name"] for app in apps}
+        for done, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = {"error": str(e)}
+            progress.put((shard, done, len(apps), name))
+
+    for ssh_manager in pool.values():
+        ssh_manager.close()
+    logging.info(f"[shard {shard}] Command cache: {cache.stats()}")
+    return results
+
+
+def validate_catalog(apps: List[Dict[str, Any]], targets: Dict[str, Dict[str, str]], processes: Optional[int] = None,
+                     threads: int = 4, run_deadline: Optional[Deadline] = None,
+                     host_budget: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Shards the applications across a process pool and aggregates the per-image results.
+    Applications without a target host are reported as skipped.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    results: Dict[str, Dict[str, Any]] = {app["name"]: {"error": "No host provisioned"}
+                                          for app in apps if app["name"] not in targets}
+    runnable = [app for app in apps if app["name"] in targets]
+    shards = [runnable[i::processes] for i in range(processes)]
+    shards = [shard for shard in shards if shard]
+    if not shards:
+        return results
+
+    with multiprocessing.Manager() as manager:
+        progress = manager.Queue()
+        log_queue = manager.Queue()
+        relay = relay_logging(log_queue)
+
+        def report_progress():
+            while True:
+                event = progress.get()
+                if event is None:
+                    break
+                shard, done, total, name = event
+                logging.info(f"[shard {shard}] {done}/{total} checked {name}")
+
+        reporter = threading.Thread(target=report_progress, daemon=True)
+        reporter.start()
+
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(check_shard, index, shard, targets, progress, threads,
+                                       run_deadline=run_deadline, host_budget=host_budget, log_queue=log_queue)
+                       for index, shard in enumerate(shards)]
+            for future in as_completed(futures):
+                results.update(future.result())
+
+        progress.put(None)
+        reporter.join()
+        relay.stop()
+
+    return results
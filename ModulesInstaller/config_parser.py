@@ -12,6 +12,43 @@ def parse_config_args() -> argparse.Namespace:
                       help="Password for authentication.", required=True)
     parser.add_argument('--name', type=str, default=os.getenv("IMAGE_NAME"), 
                       help="Name of the installation instance.", required=True)
+    parser.add_argument('--broker-socket', type=str, default=os.getenv("SSH_BROKER_SOCKET"),
+                      help="Path of a running SSH broker socket to reuse its connections.")
+
+    parser.add_argument('--store', type=str, default=os.getenv("RESULT_STORE"),
+                      help="Path of the SQLite result store (optional).")
+    parser.add_argument('--incremental', action='store_true',
+                      help="Only re-run checks that changed, failed or are older than --ttl (requires --store).")
+    parser.add_argument('--ttl', type=int, default=86400,
+                      help="Seconds a passing result stays valid in incremental mode.")
+    parser.add_argument('--watch', type=int, default=None, metavar="SECONDS",
+                      help="Keep monitoring the services every SECONDS and report only changes.")
+    parser.add_argument('--host-budget', type=float, default=None,
+                      help="Time budget in seconds for all checks on this host.")
+    parser.add_argument('--run-budget', type=float, default=None,
+                      help="Time budget in seconds for the whole run.")
+    parser.add_argument('--pipelined', action='store_true',
+                      help="Overlap the SSH connect with config loading and run web probes alongside the SSH checks.")
+    parser.add_argument('--dual-stack', action='store_true',
+                      help="Probe the web ports over IPv4 and IPv6 concurrently and report both families.")
+    parser.add_argument('--diagnose', action='store_true',
+                      help="Probe the web ports from inside the guest too (one SSH command) and classify failures as down or filtered.")
+    parser.add_argument('--host-v6', type=str, default=os.getenv("HOST_V6"),
+                      help="IPv6 address to probe in --dual-stack mode (default: AAAA lookup, then the guest's global address).")
+    parser.add_argument('--history', type=str, default=os.getenv("RESULT_HISTORY"),
+                      help="Append the check results and timings to this columnar history directory (see analyze_history.py).")
+    parser.add_argument('--metrics-file', type=str, default=os.getenv("METRICS_FILE"),
+                      help="Write OpenMetrics counters and latency histograms to this file at the end of the run.")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                      help="Serve the metrics on http://127.0.0.1:PORT/metrics while the run (e.g. --watch) lasts.")
+    parser.add_argument('--profile', action='store_true',
+                      help="Profile the run and write <name>_profile.pstats and a phase/hot-function summary <name>_profile.txt.")
+    parser.add_argument('--ssh-profile', type=str, default=os.getenv("SSH_PROFILE"),
+                      help="SSH connection profile (kex, ciphers, compression, key) written by ssh_benchmark.py --write.")
+    parser.add_argument('--ssh-key', type=str, default=os.getenv("SSH_KEY"),
+                      help="Private key tried before the password when connecting.")
+    parser.add_argument('--log-json', type=str, default=os.getenv("LOG_JSON"),
+                      help="Also write structured JSON-lines logs to this file.")
 
     args = parser.parse_args()
     args.host = args.host.strip()
@@ -6,6 +6,7 @@ from .service_check import ServiceChecker
 from Modules.report import ReportGenerator, TableType
 from .json_loader import load_app_config
 from Modules.ssh import SSHManager
+from Modules.result import Status
 
 class Controller:
     def __init__(self):
@@ -23,7 +24,7 @@ class Controller:
         Initialize the Controller with the provided configuration.
         """
         self.config = config
-        self.ssh_manager = SSHManager(config.host, config.user, config.password)
+        self.ssh_manager = SSHManager(config.host, config.user, config.password, broker_socket=config.broker_socket)
 
         # Establish SSH connection
         if not self.ssh_manager.is_connected():
@@ -62,8 +63,8 @@ class Controller:
                 port = port_info.get("port")
                 if port:  # Ensure the port is defined
                     connectivity_results = service_checker.check_web_access(self.config.host, [port])
-                    http_status = connectivity_results.get(port, {}).get("http", "❌")
-                    https_status = connectivity_results.get(port, {}).get("https", "❌")
+                    http_status = connectivity_results.get(port, {}).get("http", Status.FAIL)
+                    https_status = connectivity_results.get(port, {}).get("https", Status.FAIL)
                     self.web_report.add_web_row(port, v4_ports, v6_ports, http_status, https_status)
 
         logging.info("Processing completed")
@@ -1,12 +1,15 @@
 import json
+from typing import List, Optional
+
+WS_DIR = "/jenkins/workspace/DevOps/Public-Images/Installer/Installer-Trigger/installer-os-monitoring"
 
 def load_json(file_path: str):
     with open(file_path) as f:
         return json.load(f)
 
-def load_app_config(name: str) -> dict:
-    ws_dir = "/jenkins/workspace/DevOps/Public-Images/Installer/Installer-Trigger/installer-os-monitoring"
-    config_file = f"{ws_dir}/apps_services.json"
-    config = load_json(config_file)
-    return next((app for app in config.get("os", {}).get("applications", []) if app["name"] == name), dict())
+def load_catalog(config_file: Optional[str] = None) -> List[dict]:
+    config = load_json(config_file or f"{WS_DIR}/apps_services.json")
+    return config.get("os", {}).get("applications", [])
 
+def load_app_config(name: str) -> dict:
+    return next((app for app in load_catalog() if app["name"] == name), dict())
@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+from .service_check import ServiceChecker
+
+class ServiceMonitor:
+    def __init__(self, service_checker: ServiceChecker, services: List[Dict[str, Any]], interval: int = 60,
+                 reconnect: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Re-probes services on a schedule over an open SSH connection and reports only changes.
+        :param service_checker: Checker bound to an open SSHManager.
+        :param services: Service definitions from apps_services.json.
+        :param interval: Time (in seconds) between probe cycles.
+        :param reconnect: Optional factory returning a new SSHManager when the connection drops.
+        """
+        self.checker = service_checker
+        self.services = services
+        self.interval = interval
+        self.reconnect = reconnect
+        self.previous: Optional[Dict[str, Any]] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Collects unit states and listening ports with two remote commands."""
+        names = [service["name"] for service in self.services]
+        states = self.checker.check_services_status(names) if names else {}
+        listening = self.checker.listening_ports()
+        ports = {port_info.get("port") for service in self.services
+                 for port_info in service.get("ports", []) if port_info.get("port")}
+        return {
+            "states": states,
+            "ports": {port: port in listening for port in sorted(ports)},
+        }
+
+    @staticmethod
+    def diff(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+        changes = []
+        for name, state in current["states"].items():
+            old_state = previous["states"].get(name)
+            if old_state != state:
+                changes.append(f"Service {name}: {old_state} -> {state}")
+        for port, listening in current["ports"].items():
+            if previous["ports"].get(port) != listening:
+                changes.append(f"Port {port}: {'Listening' if listening else 'Not Listening'}")
+        return changes
+
+    def _reconnect(self) -> bool:
+        if not self.reconnect:
+            return False
+        old_manager = self.checker.ssh
+        if old_manager:
+            if old_manager.broker:
+                # Otherwise the broker hands the dead transport back to the reconnect
+                old_manager.broker.release()
+            old_manager.close()
+        ssh_manager = self.reconnect()
+        if not ssh_manager.is_connected():
+            ssh_manager.close()
+            return False
+        self.checker.ssh = ssh_manager
+        self.checker.cache.invalidate(self.checker.host)
+        return True
+
+    def poll(self) -> List[str]:
+        """Runs one probe cycle and returns the changes since the previous one."""
+        try:
+            current = self.snapshot()
+        except Exception as e:
+            logging.warning(f"Probe cycle failed: {e}")
+            if not self._reconnect():
+                return ["Connection lost"]
+            try:
+                current = self.snapshot()
+            except Exception as e:
+                logging.warning(f"Probe cycle failed after reconnecting: {e}")
+                return ["Connection lost"]
+
+        if self.previous is None:
+            self.previous = current
+            return [f"Baseline: {current['states']} listening={current['ports']}"]
+        changes = self.diff(self.previous, current)
+        self.previous = current
+        return changes
+
+    def run(self, cycles: Optional[int] = None) -> None:
+        """Polls until interrupted, or for the given number of cycles."""
+        count = 0
+        try:
+            while cycles is None or count < cycles:
+                started = time.monotonic()
+                for change in self.poll():
+                    logging.info(change)
+                count += 1
+                time.sleep(max(0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            logging.info("Monitoring stopped")
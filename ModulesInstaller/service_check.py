@@ -1,83 +1,319 @@
+import base64
+import json
 import requests
 import logging
+import socket
+import time
 import urllib3
-from rich.logging import RichHandler
-from typing import Any, Dict, List
-
-# Configure logging with RichHandler
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler()]
-)
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from Modules.command_cache import CommandCache
+from Modules.deadline import Deadline, DeadlineExceeded
+from Modules.metrics import metrics
+from Modules.result import CheckResult, Status, timed_check
 
 # Suppress only the Insecure Request Warning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Runs inside the guest (any python3): probes every port given on the command line over TCP, HTTP
+# and HTTPS on the loopback addresses at once and prints one JSON object per port
+LOCAL_PROBE_SCRIPT = """
+import json, socket, ssl, sys, threading
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+def probe(port, results):
+    result = {"port": port, "tcp": False, "http": None, "https": None}
+    for address, url_host in (("127.0.0.1", "127.0.0.1"), ("::1", "[::1]")):
+        try:
+            socket.create_connection((address, port), 3).close()
+        except (OSError, ValueError):
+            continue
+        result["tcp"] = True
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        for scheme in ("http", "https"):
+            try:
+                result[scheme] = urlopen("%s://%s:%d/" % (scheme, url_host, port), timeout=3, context=context).getcode()
+            except HTTPError as e:
+                result[scheme] = e.code
+            except Exception:
+                pass
+        break
+    results.append(result)
+
+results = []
+threads = [threading.Thread(target=probe, args=(int(port), results)) for port in sys.argv[1:]]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+for result in results:
+    print(json.dumps(result))
+"""
+
+# Without python3 the guest shell checks TCP only, one background connect per port
+LOCAL_PROBE_FALLBACK = (
+    "for p in {ports}; do (if timeout 3 bash -c \"exec 3<>/dev/tcp/127.0.0.1/$p\" 2>/dev/null; "
+    "then t=true; else t=false; fi; printf '{{\"port\": %s, \"tcp\": %s}}\\n' \"$p\" \"$t\") & done; wait"
+)
+
 
 class ServiceChecker:
-    def __init__(self, ssh_manager):
+    def __init__(self, ssh_manager, deadline: Optional[Deadline] = None, host: Optional[str] = None,
+                 image: Optional[str] = None, cache: Optional[CommandCache] = None):
         self.ssh = ssh_manager
+        self.deadline = deadline or Deadline()
+        self.host = host
+        self.image = image
+        self.cache = cache or CommandCache()
+        # HTTP status codes the agent received, per port and probe key ("http", "https_v6", ...)
+        self.answers: Dict[int, Dict[str, int]] = {}
+
+    def _read(self, command: str) -> str:
+        """Runs a read-only command, reusing its output from earlier in the run."""
+        return self.cache.run(self.host, command, self.ssh.exec_command)
 
     def check_service_installed(self, service_name: str) -> bool:
         command = f"dpkg -l | grep {service_name}"
-        output = self.ssh.exec_command(command)
+        output = self._read(command)
         return bool(output)
 
     def check_service_status(self, service_name: str) -> bool:
         command = f"systemctl is-active {service_name}"
-        output = self.ssh.exec_command(command)
+        output = self._read(command)
         return output.strip() == "active"
 
+    def _read_budgeted(self, command: str) -> str:
+        """Like _read, but returns an empty output when the time budget runs out."""
+        try:
+            return self._read(command)
+        except (DeadlineExceeded, TimeoutError) as e:
+            logging.warning(f"Time budget exhausted, '{command}' not read: {e}")
+            return ""
+
     def check_open_ports_v4(self) -> list:
         command = "ufw status | grep -v 'v6' | grep -i 'allow' | awk '{printf(\"%s\\n\", $1)}'"
-        open_ports_v4 = self.ssh.exec_command(command)
+        open_ports_v4 = self._read_budgeted(command)
         logging.info(f"Getting V4 Ports from Firewall")
         return open_ports_v4.strip().splitlines()
     
     def check_open_ports_v6(self) -> list:
         command = "ufw status | grep 'v6' | grep -i 'allow' | awk '{printf(\"%s\\n\", $1)}'"
-        open_ports_v6 = self.ssh.exec_command(command)
+        open_ports_v6 = self._read_budgeted(command)
         logging.info(f"Getting V6 ports from Firewall")
         return open_ports_v6.strip().splitlines()
     
     def check_listening_port(self, port: int) -> str:
         command = f"ss -ltn | grep :{port}"
-        output = self.ssh.exec_command(command)
+        output = self._read(command)
         return "Listening" if output else "Not Listening"
 
-    def check_web_access(self, host: str, ports: List[int]) -> Dict[int, Dict[str, str]]:
+    def check_services_status(self, service_names: List[str]) -> Dict[str, str]:
+        # systemctl prints one state per unit, in the order they were given
+        command = f"systemctl is-active {' '.join(service_names)}"
+        states = self.ssh.exec_command(command).splitlines()
+        return {name: (states[i].strip() if i < len(states) else "unknown") for i, name in enumerate(service_names)}
+
+    def listening_ports(self) -> Set[int]:
+        command = "ss -ltnH | awk '{print $4}'"
+        ports = set()
+        # Busy hosts can have thousands of sockets, parse them as they arrive
+        for address in self.ssh.exec_stream(command, max_bytes=4 * 1024 * 1024):
+            port = address.rsplit(":", 1)[-1]
+            if port.isdigit():
+                ports.add(int(port))
+        return ports
+
+    def check_local_access(self, ports: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Probes the ports from inside the guest in a single remote command: TCP connect, HTTP and
+        HTTPS against the loopback addresses, all ports at once.
+        :return: Per port {"tcp": bool, "http": status code or None, "https": status code or None}.
+            "http"/"https" are missing when the guest has no python3, ports it could not probe entirely.
+        """
+        if not ports:
+            return {}
+        port_list = " ".join(str(int(port)) for port in ports)
+        script = base64.b64encode(LOCAL_PROBE_SCRIPT.encode()).decode()
+        command = (f"if command -v python3 >/dev/null 2>&1; then "
+                   f"python3 -c \"import base64; exec(base64.b64decode('{script}'))\" {port_list}; "
+                   f"else {LOCAL_PROBE_FALLBACK.format(ports=port_list)}; fi")
+        results = {}
+        try:
+            output, _, _ = self.ssh.exec_raw(command)
+        except (ConnectionError, TimeoutError) as e:
+            logging.warning(f"In-guest port probe failed: {e}")
+            return results
+        for line in output.splitlines():
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[int(result["port"])] = {"tcp": bool(result.get("tcp")),
+                                            **{scheme: result[scheme] for scheme in ("http", "https") if scheme in result}}
+        return results
+
+    @staticmethod
+    def diagnose(external: Dict[str, Status], local: Optional[Dict[str, Any]],
+                 answers: Optional[Dict[str, int]] = None) -> str:
+        """
+        Tells apart why a port is unreachable from the agent by combining the external probe
+        statuses with the in-guest result for the same port.
+        :param answers: HTTP codes the external probes received (see `answers`); a port that
+            answered is reachable, only connection errors and timeouts can mean filtered.
+        """
+        v4 = Status.PASS in (external.get("http"), external.get("https"))
+        v6 = [external[key] for key in ("http_v6", "https_v6") if key in external]
+        if v4:
+            return "reachable (IPv4 only)" if v6 and Status.PASS not in v6 else "reachable"
+        if Status.PASS in v6:
+            return "reachable (IPv6 only)"
+        if answers:
+            return f"reachable (HTTP {'/'.join(str(code) for code in sorted(set(answers.values())))})"
+        if local is None:
+            return "unknown (not probed in guest)"
+        if not local["tcp"]:
+            return "down: nothing listening"
+        if "http" not in local:
+            # TCP-only probe of a guest without python3
+            return "filtered: listening locally"
+        codes = [str(local[scheme]) for scheme in ("http", "https") if local[scheme] is not None]
+        if codes:
+            return f"filtered: answers locally (HTTP {'/'.join(codes)})"
+        return "listening, no HTTP answer"
+
+    def _probe(self, url: str, protocol: str, family: str = "v4", timeout: Any = 5,
+               port: Optional[int] = None, key: Optional[str] = None) -> Status:
+        """
+        Requests one URL and returns PASS on HTTP 200. Records the probe latency and outcome.
+        :param timeout: Seconds, or a (connect, read) pair as accepted by requests.
+        :param port: Port of the URL; with `key`, any HTTP answer is recorded in `answers`.
+        :param key: Probe key, e.g. "https" or "http_v6".
+        """
+        if self.deadline.expired():
+            logging.warning(f"Time budget exhausted, not checking {url}")
+            return Status.TIMEOUT
+        status = Status.FAIL
+        started = time.monotonic()
+        try:
+            logging.info(f"Checking {url}...")
+            if isinstance(timeout, tuple):
+                timeout = tuple(self.deadline.timeout(part) for part in timeout)
+            else:
+                timeout = self.deadline.timeout(timeout)
+            response = requests.get(url, timeout=timeout, verify=False)
+            if port is not None:
+                self.answers.setdefault(port, {})[key or protocol] = response.status_code
+            if response.status_code == 200:
+                status = Status.PASS
+        except requests.RequestException as e:
+            logging.debug(f"Failed to connect to {url}: {e}")
+        metrics.observe("probe_seconds", time.monotonic() - started, "Web probe latency",
+                        protocol=protocol, family=family, status=status.name)
+        metrics.inc("probes", "Web probes by outcome", protocol=protocol, family=family, status=status.name)
+        return status
+
+    def check_web_access(self, host: str, ports: List[int]) -> Dict[int, Dict[str, Status]]:
         protocols = ["http", "https"]
         connectivity_results = {}
 
         for port in ports:
-            connectivity_results[port] = {protocol: "❌" for protocol in protocols}
+            connectivity_results[port] = {protocol: Status.FAIL for protocol in protocols}
+            self.answers.pop(port, None)
 
             for protocol in protocols:
-                url = f"{protocol}://{host}:{port}"
-                try:
-                    logging.info(f"Checking {url}...")
-                    response = requests.get(url, timeout=5, verify=False)
-                    if response.status_code == 200:
-                        connectivity_results[port][protocol] = "✅"
-                except requests.RequestException as e:
-                    logging.debug(f"Failed to connect to {url}: {e}")
+                connectivity_results[port][protocol] = self._probe(f"{protocol}://{host}:{port}", protocol, port=port)
+
+        return connectivity_results
+
+    def resolve_addresses(self, host: str, v6_host: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """
+        IPv4 and IPv6 address to probe: given explicitly, resolved from DNS (A/AAAA) or,
+        for an IPv4-only name or literal, the guest's first global IPv6 address read over SSH.
+        """
+        addresses: Dict[str, Optional[str]] = {"v4": None, "v6": v6_host}
+        for family, key in ((socket.AF_INET, "v4"), (socket.AF_INET6, "v6")):
+            if addresses[key]:
+                continue
+            try:
+                addresses[key] = socket.getaddrinfo(host, None, family, socket.SOCK_STREAM)[0][4][0]
+            except (socket.gaierror, IndexError):
+                pass
+        if not addresses["v6"] and self.ssh:
+            addresses["v6"] = self.guest_v6_address()
+        return addresses
 
+    def guest_v6_address(self) -> Optional[str]:
+        """First global IPv6 address configured in the guest, read over SSH."""
+        command = "ip -6 -o addr show scope global | awk '{print $4}'"
+        guest_addresses = (self._read_budgeted(command) or "").split()
+        return guest_addresses[0].split("/")[0] if guest_addresses else None
+
+    def check_web_access_dual(self, host: str, ports: List[int], v6_host: Optional[str] = None,
+                              connect_timeout: float = 2, read_timeout: float = 5,
+                              addresses: Optional[Dict[str, Optional[str]]] = None) -> Dict[int, Dict[str, Status]]:
+        """
+        Probes HTTP and HTTPS over IPv4 and IPv6 at once, so wall time stays that of the slowest
+        single probe. Connect timeouts are short because an unreachable family should fail fast.
+        :param addresses: Result of resolve_addresses, so callers probing port by port resolve once.
+        :return: Per port, statuses keyed "http"/"https" (IPv4) and "http_v6"/"https_v6".
+            Families without an address are left out.
+        """
+        addresses = addresses or self.resolve_addresses(host, v6_host)
+        targets = []
+        # IPv6 first, as happy eyeballs would
+        for family, suffix, template in (("v6", "_v6", "[{}]"), ("v4", "", "{}")):
+            if not addresses[family]:
+                logging.info(f"No {family} address for {host}, not probing it")
+                continue
+            address = template.format(addresses[family])
+            targets += [(port, protocol + suffix, f"{protocol}://{address}:{port}", protocol, family)
+                        for port in ports for protocol in ("http", "https")]
+
+        connectivity_results: Dict[int, Dict[str, Status]] = {port: {} for port in ports}
+        for port in ports:
+            self.answers.pop(port, None)
+        if not targets:
+            return connectivity_results
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            futures = {(port, key): pool.submit(self._probe, url, protocol, family, (connect_timeout, read_timeout), port, key)
+                       for port, key, url, protocol, family in targets}
+            for (port, key), future in futures.items():
+                connectivity_results[port][key] = future.result()
         return connectivity_results
 
     
-    def process_service(self, service: Dict[str,Any], report: Any) -> None:
+    @staticmethod
+    def listener_label(port: Any, listening: CheckResult) -> str:
+        """Listeners column entry of a listening check, e.g. "80 (Listening)"."""
+        state = "Listening" if listening.ok else "Not checked" if listening.status == Status.TIMEOUT else "Not Listening"
+        return f"{port} ({state})"
+
+    def process_service(self, service: Dict[str,Any], report: Any) -> List[CheckResult]:
         service_name = service["name"]
-        installed = self.check_service_installed(service_name)
-        enabled = self.check_service_status(service_name)
+        if self.deadline.expired():
+            logging.warning(f"Time budget exhausted, not checking {service_name}")
+            results = [CheckResult(check, Status.TIMEOUT, host=self.host, image=self.image, detail=service_name)
+                       for check in ("installed", "enabled")]
+            report.add_installer_row(service_name, Status.TIMEOUT, Status.TIMEOUT, [])
+            return results
+
+        installed = timed_check("installed", lambda: self.check_service_installed(service_name),
+                                self.host, self.image, service_name)
+        enabled = timed_check("enabled", lambda: self.check_service_status(service_name),
+                              self.host, self.image, service_name)
+        results = [installed, enabled]
 
         # Check listening status for each port defined in the service
         listeners: List[str] = []
         for port_info in service.get("ports", []):
             port = port_info.get("port")
             if port:  # Ensure the port is defined
-                listener_status = self.check_listening_port(port)
-                listeners.append(f"{port} ({listener_status})")
+                listening = timed_check(f"listening:{port}", lambda: self.check_listening_port(port) == "Listening",
+                                        self.host, self.image, service_name)
+                results.append(listening)
+                listeners.append(self.listener_label(port, listening))
 
-        # Add information to the report with "V"/"X"
-        report.add_installer_row(service_name, "✅" if installed else "❌", "✅" if enabled else "❌", listeners)
+        report.add_installer_row(service_name, installed.status, enabled.status, listeners)
+        return results
@@ -2,6 +2,8 @@ from .command_executor import CommandExecutor
 from .server_manager import ServerManager
 from .args_parser import parse_arguments
 from .rdp import RDPManager
+from .concurrency import AdaptiveLimiter
+from .provisioner import Provisioner, ServerRecord
 
 __version__ = "1.0.0"
 
@@ -10,4 +12,7 @@ __all__ = [
     "ServerManager",
     "parse_arguments",
     "RDPManager",
+    "AdaptiveLimiter",
+    "Provisioner",
+    "ServerRecord",
 ]
@@ -1,4 +1,5 @@
 import argparse
+import os
 
 def parse_arguments() -> argparse.Namespace:
     """
@@ -20,6 +21,18 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("--disks", "-d", required=True, type=int, help="Disk Size (in GB)")
     parser.add_argument("--ostype", "-os", required=False, help="OS Type (optional, auto-detected if not specified)")
     parser.add_argument("--lan", "-l", required=True, help="LAN Name")
+    parser.add_argument("--broker-socket", required=False, default=os.getenv("SSH_BROKER_SOCKET"), help="SSH broker socket path (optional, reuses brokered SSH connections)")
+    parser.add_argument("--image", required=False, default=os.getenv("IMAGE_NAME"), help="Image name the machine was created from (optional, defaults to the machine name)")
+    parser.add_argument("--host-budget", type=float, default=None, help="Time budget in seconds for all operations on this host (optional)")
+    parser.add_argument("--run-budget", type=float, default=None, help="Time budget in seconds for the whole run (optional)")
+    parser.add_argument("--converge", type=float, default=None, metavar="SECONDS", help="Re-check the expected state after each operation with backoff for up to SECONDS before failing it (optional)")
+    parser.add_argument("--clone", action="store_true", help="Clone the server after the rename and verify the clone while the remaining operations run (optional)")
+    parser.add_argument("--history", required=False, default=os.getenv("RESULT_HISTORY"), help="Append the results and timings to this columnar history directory, see analyze_history.py (optional)")
+    parser.add_argument("--metrics-file", required=False, default=os.getenv("METRICS_FILE"), help="Write OpenMetrics counters and latency histograms to this file at the end of the run (optional)")
+    parser.add_argument("--profile", action="store_true", help="Profile the run and write <machine>_profile.pstats and a phase/hot-function summary next to the results CSV (optional)")
+    parser.add_argument("--ssh-profile", required=False, default=os.getenv("SSH_PROFILE"), help="SSH connection profile (kex, ciphers, compression, key) written by ssh_benchmark.py --write (optional)")
+    parser.add_argument("--ssh-key", required=False, default=os.getenv("SSH_KEY"), help="Private key tried before the password on every SSH (re)connect (optional)")
+    parser.add_argument("--log-json", required=False, default=os.getenv("LOG_JSON"), help="Also write structured JSON-lines logs to this file (optional)")
 
     args = parser.parse_args()
     return args
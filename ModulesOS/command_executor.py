@@ -1,58 +1,85 @@
 import subprocess
 import json
+import logging
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from Modules.deadline import Deadline
+from Modules.metrics import metrics
+from Modules.result import Status
+from .concurrency import TARGET_LATENCY_SHARE, AdaptiveLimiter
+
+logger = logging.getLogger(__name__)
 
 class CommandExecutor:
     """Handles command execution and task management."""
 
     MAIN_PY_PATH = "/opt/utils/cwmCLI/main.py"
 
+    # Shared by every executor in the process; None means no limit on in-flight tasks
+    limiter: Optional[AdaptiveLimiter] = None
+
     @staticmethod
-    def run_command(command: str) -> Optional[str]:
+    def run_command(command: str, timeout: Optional[float] = None) -> Optional[str]:
         """
         Runs a shell command and captures the output.
-        Logs errors if the command fails.
+        Logs errors if the command fails or does not finish within the timeout.
         """
         try:
-            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, text=True)
+            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, text=True, timeout=timeout)
             return result.stdout.strip()
+        except subprocess.TimeoutExpired:
+            logger.error(f"Command timed out after {timeout:.0f} seconds: {command}")
+            return None
         except Exception as e:
-            print(f"Error running command: {e}")
+            logger.error(f"Error running command: {e}")
             return None
 
     @classmethod
-    def wait_queue(cls, task_id: str, timeout: Optional[int] = None, interval: Optional[int] = None) -> str:
+    def wait_queue(cls, task_id: str, timeout: Optional[int] = None, interval: Optional[int] = None,
+                   deadline: Optional[Deadline] = None) -> Status:
         """
         Waits for a task in the queue to complete and checks if exitCode is 0.
+        The queue wait timeout is capped by the remaining budget of the deadline.
         """
+        deadline = deadline or Deadline()
         try:
-            print(f"Waiting for queue task {task_id} to complete...\n")
+            if deadline.expired():
+                logger.warning(f"Time budget exhausted, not waiting for queue task {task_id}.")
+                return Status.TIMEOUT
+            logger.info(f"Waiting for queue task {task_id} to complete...")
+            timeout = deadline.timeout(timeout)
             command = f"{cls.MAIN_PY_PATH} queue wait -id {task_id}"
             if timeout:
-                command += f" -t {timeout}"
+                command += f" -t {max(1, int(timeout))}"
             if interval:
                 command += f" -i {interval}"
-            result = cls.run_command(command)
+            # Give the CLI a grace period to report its own timeout before killing it
+            started = time.monotonic()
+            result = cls.run_command(command, timeout=timeout + 30 if timeout else None)
+            metrics.observe("queue_wait_seconds", time.monotonic() - started, "Duration of `queue wait` calls")
+            if deadline.expired() and not result:
+                logger.warning(f"Time budget exhausted while waiting for queue task {task_id}.")
+                return Status.TIMEOUT
             if not result:
-                print(f"Error: No result from queue wait for task {task_id}")
-                return "❌"
+                logger.error(f"No result from queue wait for task {task_id}")
+                return Status.FAIL
 
             try:
                 task_data = json.loads(result)
                 exit_code = task_data.get("exitCode", -1)
                 if exit_code == 0:
-                    print(f"Task {task_id} completed successfully.\n")
-                    return "✅"
+                    logger.info(f"Task {task_id} completed successfully.")
+                    return Status.PASS
                 else:
-                    print(f"Task {task_id} failed with exitCode: {exit_code}.")
-                    return "❌"
+                    logger.error(f"Task {task_id} failed with exitCode: {exit_code}.")
+                    return Status.FAIL
             except json.JSONDecodeError:
-                print(f"Error: Task {task_id} returned a non-JSON response: {result}")
-                return "❌"
+                logger.error(f"Task {task_id} returned a non-JSON response: {result}")
+                return Status.FAIL
         except Exception as e:
-            print(f"Error in wait_queue for task {task_id}: {e}")
-            return "❌"
+            logger.error(f"Error in wait_queue for task {task_id}: {e}")
+            return Status.FAIL
 
     @staticmethod
     def extract_task_id(command_output: str) -> Optional[str]:
@@ -62,48 +89,49 @@ class CommandExecutor:
         Returns the first valid task ID as a string.
         """
         try:
-            print(f"Command Results: {command_output}")
+            logger.info(f"Command Results: {command_output}")
             if command_output.startswith("{") or command_output.startswith("["):
                 try:
                     tasks_data = json.loads(command_output)
                     if isinstance(tasks_data, dict):
                         task_id = tasks_data.get("cmdId")
                         if task_id:
-                            print(f"Extracted Task ID: {task_id}\n")
+                            logger.info(f"Extracted Task ID: {task_id}")
                             return str(task_id)
                     elif isinstance(tasks_data, list):
                         for task_id in tasks_data:
                             if isinstance(task_id, int):
-                                print(f"Extracted Task ID: {task_id}\n")
+                                logger.info(f"Extracted Task ID: {task_id}")
                                 return str(task_id)
-                    print("No valid Task ID found in JSON response.")
+                    logger.warning("No valid Task ID found in JSON response.")
                     return None
                 except json.JSONDecodeError:
-                    print(f"Error decoding JSON: {command_output}")
+                    logger.error(f"Error decoding JSON: {command_output}")
             task_id = str(command_output.strip())
             if task_id.isdigit():
-                print(f"Extracted Task ID: {task_id}")
+                logger.info(f"Extracted Task ID: {task_id}")
                 return task_id
             raise ValueError("Could not extract Task ID.")
         except Exception as e:
-            print(f"Error extracting task ID: {e}")
+            logger.error(f"Error extracting task ID: {e}")
             return None
 
     @classmethod
-    def extract_clone_task_id(cls, machine_name: str, index: int, timeout: int = 120, interval: int = 10) -> Optional[str]:
+    def extract_clone_task_id(cls, machine_name: str, index: int, timeout: int = 120, interval: int = 10,
+                              deadline: Optional[Deadline] = None) -> Optional[str]:
         """
         Waits for the task ID to appear in the queue by filtering with the specific cloned service name.
         Constructs the service name as `{machine_name}{index}-clone` to match the queue output.
         """
-        start_time = time.time()
+        deadline = (deadline or Deadline()).child(timeout)
         expected_service_name = f"{machine_name}{index}-clone"
-        print(f"Expected service name: {expected_service_name}\n")
-        while time.time() - start_time < timeout:
-            print(f"Checking queue for task with service name '{expected_service_name}'...\n")
+        logger.info(f"Expected service name: {expected_service_name}")
+        while not deadline.expired():
+            logger.info(f"Checking queue for task with service name '{expected_service_name}'...")
             queue_output = cls.run_command(f"{cls.MAIN_PY_PATH} queue list")
             if not queue_output:
-                print("Error: No output from queue list command.")
-                time.sleep(interval)
+                logger.error("No output from queue list command.")
+                time.sleep(deadline.timeout(interval))
                 continue
             try:
                 queue_data = json.loads(queue_output)
@@ -112,26 +140,67 @@ class CommandExecutor:
                         service_name = task.get("serviceName", "")
                         task_id = task.get("id")
                         if service_name == expected_service_name and task_id:
-                            print(f"Found task ID {task_id} for service name '{expected_service_name}'.\n")
+                            logger.info(f"Found task ID {task_id} for service name '{expected_service_name}'.")
                             return str(task_id)
-                    print(f"No matching task found for service name '{expected_service_name}'. Retrying in {interval} seconds...")
+                    logger.info(f"No matching task found for service name '{expected_service_name}'. Retrying in {interval} seconds...")
                 else:
-                    print(f"Unexpected queue data format: {queue_data}")
+                    logger.warning(f"Unexpected queue data format: {queue_data}")
             except json.JSONDecodeError as e:
-                print(f"Error parsing queue list JSON: {queue_output}, Error: {e}")
-            time.sleep(interval)
-        print(f"Timeout reached: Task with service name '{expected_service_name}' not found within {timeout} seconds.")
+                logger.error(f"Error parsing queue list JSON: {queue_output}, Error: {e}")
+            time.sleep(deadline.timeout(interval))
+        logger.error(f"Timeout reached: Task with service name '{expected_service_name}' not found within {timeout} seconds.")
         return None
 
     @classmethod
-    def execute_task(cls, command: str) -> str:
+    def execute_task(cls, command: str, deadline: Optional[Deadline] = None, timeout: Optional[int] = None,
+                     interval: Optional[int] = None) -> Status:
         """
         Executes a command, extracts the task ID, and waits for the task to complete.
+        timeout and interval are passed on to the queue wait.
+        """
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            logger.warning("Time budget exhausted, task not submitted.")
+            return Status.TIMEOUT
+        started = time.monotonic()
+        status = Status.FAIL
+        try:
+            if cls.limiter is None:
+                status = cls._submit_and_wait(command, deadline, timeout, interval)
+                return status
+            with cls.limiter.slot(deadline) as outcome:
+                status = cls._submit_and_wait(command, deadline, timeout, interval)
+                outcome["ok"] = status == Status.PASS
+                return status
+        except TimeoutError:
+            logger.warning("Time budget exhausted while waiting for a free task slot.")
+            status = Status.TIMEOUT
+            return status
+        finally:
+            metrics.observe("task_seconds", time.monotonic() - started, "Cloud task latency, submit to completion",
+                            status=status.name)
+            metrics.inc("tasks", "Cloud tasks by outcome", status=status.name)
+
+    @classmethod
+    def execute_tasks(cls, commands: List[str], deadline: Optional[Deadline] = None, timeout: Optional[int] = None,
+                      interval: Optional[int] = None) -> List[Status]:
+        """
+        Executes several independent tasks concurrently, in-flight count bounded by the limiter.
+        Returns the statuses in the order of the commands.
         """
-        result = cls.run_command(command)
+        if cls.limiter is None:
+            # Without a queue-wait timeout there is no latency to compare against, only failures back off
+            cls.limiter = AdaptiveLimiter(target_latency=timeout * TARGET_LATENCY_SHARE if timeout else float("inf"))
+        with ThreadPoolExecutor(max_workers=max(1, min(len(commands), cls.limiter.maximum))) as pool:
+            return list(pool.map(lambda command: cls.execute_task(command, deadline, timeout, interval), commands))
+
+    @classmethod
+    def _submit_and_wait(cls, command: str, deadline: Deadline, timeout: Optional[int] = None,
+                         interval: Optional[int] = None) -> Status:
+        result = cls.run_command(command, timeout=deadline.timeout(None))
         if result is None:
-            return "❌"
+            return Status.FAIL
         task_id = cls.extract_task_id(result)
         if task_id:
-            return cls.wait_queue(task_id)
-        return "❌"
+            return cls.wait_queue(task_id, timeout=timeout, interval=interval, deadline=deadline)
+        return Status.FAIL
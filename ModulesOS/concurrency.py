@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from Modules.deadline import Deadline
+
+# Share of the queue-wait timeout a task may take before the queue counts as congested
+TARGET_LATENCY_SHARE = 0.8
+
+class AdaptiveLimiter:
+    def __init__(self, target_latency: float, initial: int = 3, minimum: int = 1, maximum: int = 16,
+                 backoff: float = 0.5, cooldown: float = 30.0) -> None:
+        """
+        AIMD concurrency limit for cloud operations: the limit grows by one slot per
+        window of successful, fast operations and is cut multiplicatively on API errors,
+        failed tasks or queue latency above the target.
+        :param target_latency: Task duration (in seconds) above which the queue is considered congested.
+            Derive it from the queue-wait timeout: healthy create tasks take most of it.
+        :param initial: Starting number of in-flight operations.
+        :param minimum: Lower bound of the limit.
+        :param maximum: Upper bound of the limit.
+        :param backoff: Factor applied to the limit on congestion.
+        :param cooldown: Minimum time (in seconds) between two decreases, so one burst of failures counts once.
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> bool:
+        """Blocks until a slot is free. Returns False if the deadline ran out first."""
+        deadline = deadline or Deadline()
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                if deadline.expired():
+                    return False
+                self.condition.wait(deadline.timeout(5))
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, ok: bool) -> None:
+        """Frees a slot and adjusts the limit from the observed outcome."""
+        with self.condition:
+            self.in_flight -= 1
+            self._observe(latency, ok)
+            self.condition.notify_all()
+
+    def _observe(self, latency: float, ok: bool) -> None:
+        previous = int(self.limit)
+        if ok and latency <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif time.monotonic() - self.last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self.last_decrease = time.monotonic()
+        if int(self.limit) != previous:
+            logging.info(f"Concurrency limit {previous} -> {int(self.limit)} (latency {latency:.0f}s, ok={ok})")
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None):
+        """
+        Context manager holding a slot for one operation. The body sets `outcome["ok"]`
+        to report failure; exceptions count as failures.
+        """
+        if not self.acquire(deadline):
+            raise TimeoutError("Time budget exhausted while waiting for a concurrency slot")
+        outcome = {"ok": True}
+        start = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            outcome["ok"] = False
+            raise
+        finally:
+            self.release(time.monotonic() - start, outcome["ok"])
@@ -0,0 +1,39 @@
+import logging
+import time
+from typing import Callable, Optional, Tuple
+from Modules.deadline import Deadline
+from Modules.result import Status
+
+logger = logging.getLogger(__name__)
+
+def converge(check: Callable[[], Status], timeout: float, deadline: Optional[Deadline] = None,
+             initial_interval: float = 2.0, factor: float = 2.0, max_interval: float = 30.0,
+             before_retry: Optional[Callable[[], None]] = None) -> Tuple[Status, float, int]:
+    """
+    Re-evaluates `check` with exponential backoff until it passes or the time runs out.
+    Only FAIL is retried; PASS and TIMEOUT end the wait immediately.
+    :param check: Verification returning the Status of the expected state.
+    :param timeout: Time (in seconds) the state is given to converge.
+    :param deadline: Optional enclosing time budget.
+    :param initial_interval: Delay (in seconds) before the first retry.
+    :param factor: Growth factor of the delay between retries.
+    :param max_interval: Upper bound of the delay between retries.
+    :param before_retry: Optional callable run before every retry, e.g. to drop cached command outputs.
+    :return: The last status, the seconds until it was reached and the number of attempts.
+    """
+    deadline = (deadline or Deadline()).child(timeout)
+    start = time.monotonic()
+    interval = initial_interval
+    attempts = 1
+    status = check()
+    while status == Status.FAIL and not deadline.expired():
+        logger.info(f"Not converged yet (attempt {attempts}), re-checking in {interval:.0f}s")
+        time.sleep(deadline.timeout(interval))
+        if deadline.expired():
+            break
+        if before_retry:
+            before_retry()
+        attempts += 1
+        status = check()
+        interval = min(max_interval, interval * factor)
+    return status, time.monotonic() - start, attempts
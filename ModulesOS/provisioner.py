@@ -0,0 +1,130 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from Modules.deadline import Deadline
+from Modules.result import Status
+from .command_executor import CommandExecutor
+
+class ServerRecord:
+    """Connection details of a provisioned server, as handed to the checkers."""
+
+    __slots__ = ("name", "image", "uuid", "ip", "mac", "gateway", "subnet")
+
+    def __init__(self, name: str, image: str, uuid: str, ip: str, mac: Optional[str] = None,
+                 gateway: Optional[str] = None, subnet: Optional[str] = None) -> None:
+        self.name = name
+        self.image = image
+        self.uuid = uuid
+        self.ip = ip
+        self.mac = mac
+        self.gateway = gateway
+        self.subnet = subnet
+
+    def to_dict(self) -> Dict[str, Any]:
+        # "host" keeps the output usable as catalog_check.py --hosts input
+        return {"host": self.ip, **{slot: getattr(self, slot) for slot in self.__slots__}}
+
+
+class Provisioner:
+    def __init__(self, executor: CommandExecutor, datacenter: str, config_file: str = "config.json",
+                 deadline: Optional[Deadline] = None) -> None:
+        """
+        Creates servers for many images at once through the cloud CLI.
+        :param executor: CommandExecutor used for CLI calls and queue waits.
+        :param datacenter: Datacenter to create the servers in.
+        :param config_file: CLI config file with the API credentials.
+        :param deadline: Optional time budget for the whole provisioning run.
+        """
+        self.executor = executor
+        self.datacenter = datacenter
+        self.config_file = config_file
+        self.deadline = deadline or Deadline()
+        self._disk_images: Optional[List[Dict[str, Any]]] = None
+
+    def _cli(self, arguments: str) -> str:
+        return f"{CommandExecutor.MAIN_PY_PATH} -c {self.config_file} {arguments}"
+
+    def _run_json(self, arguments: str) -> Optional[Any]:
+        output = self.executor.run_command(self._cli(arguments), timeout=self.deadline.timeout(None))
+        if not output:
+            return None
+        try:
+            return json.loads(output)
+        except json.JSONDecodeError:
+            logging.error(f"Non-JSON response from '{arguments}': {output}")
+            return None
+
+    def resolve_image_ids(self, images: List[str]) -> Dict[str, Optional[str]]:
+        """Maps image names to disk image IDs using a single, cached `hdlib list` call."""
+        if self._disk_images is None:
+            self._disk_images = self._run_json(f"hdlib list --datacenter {self.datacenter}") or []
+            logging.info(f"Loaded {len(self._disk_images)} disk images for {self.datacenter}")
+
+        image_ids = {}
+        for image in images:
+            # Same substring match as `hdlib list --filter`
+            match = next((disk for disk in self._disk_images
+                          if any(image in str(disk.get(field, "")) for field in ("name", "description"))), None)
+            image_ids[image] = match.get("id") if match else None
+            if not match:
+                logging.error(f"No disk image found for {image}")
+        return image_ids
+
+    def create_servers(self, machines: Dict[str, str], image_ids: Dict[str, str], password: str, disk_size: int,
+                       cpu: str, ram: int, timeout: int = 1500, interval: int = 10) -> Dict[str, Status]:
+        """
+        Submits one create per machine and waits for all creation tasks together.
+        :param machines: Mapping of machine name to image name.
+        :return: Mapping of machine name to the creation status.
+        """
+        names = list(machines)
+        commands = [
+            self._cli(f"servers create --datacenter {self.datacenter} --diskImageId {image_ids[machines[name]]} "
+                      f"--names {name} --password {password} --disks {disk_size} --cpuCores {cpu} --memory {ram}")
+            for name in names
+        ]
+        statuses = self.executor.execute_tasks(commands, deadline=self.deadline, timeout=timeout, interval=interval)
+        return dict(zip(names, statuses))
+
+    def fetch_records(self, machines: Dict[str, str], name_filter: str) -> Dict[str, Optional[ServerRecord]]:
+        """Looks up IP, UUID and network details of the created machines with one `servers list` call."""
+        servers = {server.get("name"): server for server in (self._run_json(f"servers list -f {name_filter}") or [])}
+
+        def fetch(name: str) -> Optional[ServerRecord]:
+            server = servers.get(name)
+            if not server or not server.get("id") or not server.get("ips"):
+                logging.error(f"Server {name} not found in server list")
+                return None
+            network = self._run_json(f"server --uuid {server['id']} network list") or {}
+            nics = network.get("nics", [])
+            return ServerRecord(
+                name=name,
+                image=machines[name],
+                uuid=server["id"],
+                ip=server["ips"][0],
+                mac=next((nic.get("mac") for nic in nics if nic.get("mac")), None),
+                gateway=next((nic.get("gateway") for nic in nics if nic.get("gateway")), None),
+                subnet=next((nic.get("subnetMask") for nic in nics if nic.get("subnetMask")), None),
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(machines), 8))) as pool:
+            return dict(zip(machines, pool.map(fetch, machines)))
+
+    def provision(self, images: List[str], name_prefix: str, password: str, disk_size: int, cpu: str, ram: int,
+                  timeout: int = 1500, interval: int = 10) -> Dict[str, Optional[ServerRecord]]:
+        """
+        Provisions one server per image and returns the ready server records keyed by image.
+        Images that could not be resolved or created map to None.
+        """
+        image_ids = self.resolve_image_ids(images)
+        machines = {f"{name_prefix}-{index}": image for index, image in enumerate(images, start=1) if image_ids[image]}
+
+        statuses = self.create_servers(machines, image_ids, password, disk_size, cpu, ram, timeout, interval)
+        ready = {name: image for name, image in machines.items() if statuses[name] == Status.PASS}
+        for name in machines.keys() - ready.keys():
+            logging.error(f"Creating {name} ({machines[name]}) finished with {statuses[name].name}")
+
+        records = self.fetch_records(ready, name_prefix) if ready else {}
+        return {image: next((record for name, record in records.items() if machines[name] == image), None)
+                for image in images}
@@ -1,9 +1,13 @@
 import winrm
+import base64
 import logging
 import time
+from Modules.circuit import default_breaker
+from Modules.deadline import Deadline
+from Modules.metrics import metrics, record_connect
 
 class RDPManager:
-    def __init__(self, host, user, password, retries=10, retry_timeout=10):
+    def __init__(self, host, user, password, retries=10, retry_timeout=10, deadline=None, breaker=None):
         """
         Initializes the RDPManager and tries to establish a WinRM connection to the host.
         :param host: The hostname or IP of the server.
@@ -11,62 +15,144 @@ class RDPManager:
         :param password: The password for WinRM.
         :param retries: Number of retries for connection attempts.
         :param retry_timeout: Time (in seconds) to wait between retries.
+        :param deadline: Optional time budget bounding connection attempts and remote commands.
+        :param breaker: Circuit breaker refusing attempts to hosts that keep failing; shared per process by default.
         """
         self.host = host
         self.user = user
         self.password = password
         self.retries = retries
         self.retry_timeout = retry_timeout
+        self.deadline = deadline or Deadline()
+        self.breaker = breaker or default_breaker
+        # Classification of the last failed connection attempt
+        self.failure = None
         self.session = None
+        self.shell_id = None
         self.connected = self._create_session()
 
     def _create_session(self):
         """
-        Creates a WinRM session and attempts to connect to the host.
+        Creates a WinRM session and opens the remote shell all commands run in.
+        Opening the shell authenticates against the host, so no test command is needed.
         """
         for attempt in range(1, self.retries + 1):
+            if self.deadline.expired():
+                logging.error(f"Time budget exhausted after {attempt - 1} attempts. Could not connect to {self.host} via WinRM.")
+                return False
+            if not self.breaker.allow(self.host):
+                logging.error(f"Not connecting to {self.host} via WinRM, {self.breaker.describe(self.host)}.")
+                return False
+            started = time.monotonic()
             try:
                 logging.info(f"Attempt {attempt}: Connecting to {self.host} via WinRM...")
                 self.session = winrm.Session(
-                    self.host, auth=(self.user, self.password), transport="ntlm"
+                    self.host, auth=(self.user, self.password), transport="ntlm", **self._timeouts()
                 )
-                # Test the connection
-                result = self.session.run_ps("Write-Output 'WinRM Connection Successful'")
-                if result.status_code == 0:
-                    logging.info(f"WinRM connection established successfully to {self.host}.")
-                    return True
-                else:
-                    logging.error(f"Connection test failed: {result.std_err.decode()}")
+                self.shell_id = self.session.protocol.open_shell()
+                logging.info(f"WinRM connection established successfully to {self.host}.")
+                self.breaker.record_success(self.host)
+                record_connect("winrm", time.monotonic() - started, "ok")
+                return True
             except Exception as e:
-                logging.error(f"Attempt {attempt} failed: {e}")
+                self.failure = self.breaker.record_failure(self.host, e)
+                record_connect("winrm", time.monotonic() - started, self.failure.value)
+                logging.error(f"Attempt {attempt} failed ({self.failure.value}): {e}")
 
+            if attempt < self.retries and self.breaker.blocked(self.host):
+                continue
             if attempt < self.retries:
-                logging.info(f"Retrying in {self.retry_timeout} seconds...")
-                time.sleep(self.retry_timeout)
+                metrics.inc("connect_retries", "Connection attempts retried after a failure", transport="winrm")
+                delay = self.deadline.timeout(self.retry_timeout)
+                logging.info(f"Retrying in {delay:.0f} seconds...")
+                time.sleep(delay)
             else:
                 logging.error(f"All {self.retries} attempts failed. Could not connect to {self.host} via WinRM.")
                 return False
 
         return False
 
+    def _timeouts(self):
+        """
+        Sizes the WinRM timeouts from the remaining budget, keeping pywinrm's
+        requirement that the read timeout exceeds the operation timeout.
+        """
+        remaining = self.deadline.timeout(30)
+        if remaining is None or remaining >= 30:
+            return {}
+        read_timeout = max(2, int(remaining))
+        return {"read_timeout_sec": read_timeout, "operation_timeout_sec": read_timeout - 1}
+
     def run_ps(self, command):
         """
         Executes a PowerShell command on the remote server.
         :param command: The PowerShell command to execute.
         :return: The output of the command as a string.
         """
-        if not self.connected or not self.session:
+        if not self.connected or not self.session or not self.shell_id:
             raise ConnectionError("WinRM session is not connected.")
+        self.deadline.check("running PowerShell command")
 
-        try:
-            result = self.session.run_ps(command)
-            if result.status_code != 0:
-                logging.error(f"PowerShell execution error: {result.std_err.decode()}")
+        for attempt in range(2):
+            started = time.monotonic()
+            try:
+                std_out, std_err, status_code = self._run_in_shell(command)
+                metrics.observe("remote_command_seconds", time.monotonic() - started, "Remote command latency",
+                                transport="winrm", outcome="ok" if status_code == 0 else "error")
+                if status_code != 0:
+                    logging.error(f"PowerShell execution error: {std_err.decode()}")
+                    return ""
+                return std_out.decode().strip()
+            except Exception as e:
+                metrics.observe("remote_command_seconds", time.monotonic() - started, "Remote command latency",
+                                transport="winrm", outcome="exception")
+                logging.error(f"Failed to execute PowerShell command: {e}")
+                # The shell may have been closed by the host (reboot, idle timeout), reopen it once
+                if attempt == 0 and self._reopen_shell():
+                    continue
                 return ""
-            return result.std_out.decode().strip()
+        return ""
+
+    def _run_in_shell(self, command):
+        """
+        Runs a PowerShell command inside the long-lived shell.
+        :return: A tuple of (stdout, stderr, status_code).
+        """
+        # PowerShell expects the encoded command as base64 of UTF-16LE
+        encoded = base64.b64encode(command.encode("utf_16_le")).decode("ascii")
+        protocol = self.session.protocol
+        command_id = protocol.run_command(self.shell_id, "powershell", ["-NoProfile", "-NonInteractive", "-EncodedCommand", encoded])
+        try:
+            return protocol.get_command_output(self.shell_id, command_id)
+        finally:
+            protocol.cleanup_command(self.shell_id, command_id)
+
+    def _reopen_shell(self):
+        self._close_shell()
+        try:
+            self.shell_id = self.session.protocol.open_shell()
+            logging.info(f"Reopened WinRM shell on {self.host}.")
+            return True
         except Exception as e:
-            logging.error(f"Failed to execute PowerShell command: {e}")
-            return ""
+            logging.error(f"Failed to reopen WinRM shell on {self.host}: {e}")
+            self.connected = False
+            return False
+
+    def _close_shell(self):
+        if self.session and self.shell_id:
+            try:
+                self.session.protocol.close_shell(self.shell_id)
+            except Exception as e:
+                logging.warning(f"Failed to close WinRM shell: {e}")
+        self.shell_id = None
+
+    def close(self):
+        """
+        Closes the remote shell if it is open.
+        """
+        if self.shell_id:
+            self._close_shell()
+            logging.info("WinRM shell closed.")
 
     def is_connected(self):
         """
@@ -1,13 +1,38 @@
+import json
+import logging
 import random
 import csv
-from typing import Optional
+import time
+from typing import Callable, Iterable, Optional, Tuple
 from Modules.ssh import SSHManager
+from Modules.circuit import CircuitBreaker, default_breaker
+from Modules.command_cache import CommandCache
+from Modules.deadline import Deadline, DeadlineExceeded
+from Modules.log import log_context
+from Modules.metrics import metrics
+from Modules.result import Status, CheckResult
 from .rdp import RDPManager
 from .command_executor import CommandExecutor
+from .convergence import converge
+
+logger = logging.getLogger(__name__)
 
 class ServerManager:
-    def __init__(self, executor: CommandExecutor):
+    def __init__(self, executor: CommandExecutor, broker_socket: Optional[str] = None, deadline: Optional[Deadline] = None,
+                 image: Optional[str] = None, converge_timeout: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
         self.executor = executor
+        self.image = image
+        self.host = None
+        self.broker_socket = broker_socket
+        self.deadline = deadline or Deadline()
+        # Shared with the SSH/WinRM managers so a dead host stops being retried by every layer
+        self.breaker = breaker or default_breaker
+        # Outputs of read-only guest commands, dropped after every lifecycle task and reconnect
+        self.cache = CommandCache()
+        # Seconds post-operation checks are re-evaluated until the guest converges, None checks once
+        self.converge_timeout = converge_timeout
+        self.convergence: Optional[Tuple[Status, float, int]] = None
         self.ssh_manager = None
         self.rdp_manager = None
         self.os_type = None
@@ -21,22 +46,24 @@ class ServerManager:
 
     def set_connection_managers(self, ip: str, password: str, os_type: Optional[str] = None) -> bool:
         """Set up connection managers with initial password and prepare for updates."""
-        print("Setting up connection managers...")
+        logger.info("Setting up connection managers...")
+        self.host = ip
         self.new_password = f"{password}{self.index}"
 
         if os_type == "windows":
             self.os_type = "windows"
             if not self._update_connection(ip, password):
-                print("Error: Failed to establish RDP connection with initial password.")
+                logger.error("Failed to establish RDP connection with initial password.")
                 self.os_type = "unknown"
                 return False
         else:
-            print("Attempting OS detection via SSH with initial password...")
+            logger.info("Attempting OS detection via SSH with initial password...")
             if not self._update_connection(ip, password) or not self.ssh_manager:
-                print("Error: Failed to establish SSH connection with initial password.")
+                logger.error("Failed to establish SSH connection with initial password.")
                 self.os_type = "unknown"
                 return False
-            os_id = self.ssh_manager.exec_command("grep -i '^ID=' /etc/os-release | cut -d= -f2 | tr -d '\"'").strip().lower()
+            os_id = self.cache.run(ip, "grep -i '^ID=' /etc/os-release | cut -d= -f2 | tr -d '\"'",
+                                   self.ssh_manager.exec_command).strip().lower()
             self.os_type = os_id if os_id else "unknown"
 
         self.network_path = {
@@ -51,16 +78,21 @@ class ServerManager:
             "freebsd": "/etc/rc.net.conf",
         }.get(self.os_type)
 
+        metrics.set_labels(os_type=self.os_type)
+
         if not self.network_path and self.os_type != "windows":
-            print(f"Warning: No network config path for OS '{self.os_type}'")
+            logger.warning(f"No network config path for OS '{self.os_type}'")
 
-        print(f"Connection setup successful for {self.os_type} with initial password.")
-        print(f"Detected OS: {self.os_type}")
-        print(f"Network Path: {self.network_path}")
+        logger.info(f"Connection setup successful for {self.os_type} with initial password.")
+        logger.info(f"Detected OS: {self.os_type}")
+        logger.info(f"Network Path: {self.network_path}")
         return True
 
     def _update_connection(self, ip: str, password: str) -> bool:
             """Establishes or reuses the connection with the specified password."""
+            if self.deadline.expired():
+                logger.error("Time budget exhausted, not connecting.")
+                return False
             if self.os_type == "windows":
                 if self.rdp_manager and self.rdp_manager.is_connected():
                     # Verify the RDP connection is still usable
@@ -69,14 +101,16 @@ class ServerManager:
                         if test_result and "x" in test_result.strip():
                             return True
                         else:
-                            print("RDP connection active but test failed, re-establishing...")
+                            logger.warning("RDP connection active but test failed, re-establishing...")
                     except:
-                        print(f"Establishing new RDP connection...")
-                self.rdp_manager = RDPManager(ip, "Administrator", password)
+                        logger.info(f"Establishing new RDP connection...")
+                    self.rdp_manager.close()
+                self.cache.invalidate(ip)
+                self.rdp_manager = RDPManager(ip, "Administrator", password, deadline=self.deadline, breaker=self.breaker)
                 self.ssh_manager = None
-                if not self.rdp_manager.is_connected():
-                    print("RDP connection failed, attempting to re-establish...")
-                    self.rdp_manager = RDPManager(ip, "Administrator", password)
+                if not self.rdp_manager.is_connected() and not self.deadline.expired() and not self.breaker.blocked(ip):
+                    logger.warning("RDP connection failed, attempting to re-establish...")
+                    self.rdp_manager = RDPManager(ip, "Administrator", password, deadline=self.deadline, breaker=self.breaker)
                 return self.rdp_manager.is_connected()
             else:
                 if self.ssh_manager and self.ssh_manager.is_connected():
@@ -85,16 +119,30 @@ class ServerManager:
                         if test_result and "x" in test_result.strip():
                             return True
                         else:
-                            print("SSH connection active but test failed, re-establishing...")
+                            logger.warning("SSH connection active but test failed, re-establishing...")
                     except:
-                        print(f"Establishing new SSH connection...")
-                self.ssh_manager = SSHManager(ip, "root", password)
+                        logger.info(f"Establishing new SSH connection...")
+                    if self.ssh_manager.broker:
+                        # Otherwise the broker keeps the old transport (and credentials) for the next process
+                        self.ssh_manager.broker.release()
+                    self.ssh_manager.close()
+                self.cache.invalidate(ip)
+                self.ssh_manager = SSHManager(ip, "root", password, broker_socket=self.broker_socket, deadline=self.deadline,
+                                              breaker=self.breaker)
                 self.rdp_manager = None
-                if not self.ssh_manager.is_connected():
-                    print("SSH connection failed, attempting to re-establish...")
-                    self.ssh_manager = SSHManager(ip, "root", password)
+                if not self.ssh_manager.is_connected() and not self.deadline.expired() and not self.breaker.blocked(ip):
+                    logger.warning("SSH connection failed, attempting to re-establish...")
+                    self.ssh_manager = SSHManager(ip, "root", password, broker_socket=self.broker_socket, deadline=self.deadline,
+                                              breaker=self.breaker)
                 return self.ssh_manager.is_connected()
 
+    def close(self) -> None:
+        """Closes the open SSH or WinRM connection."""
+        if self.rdp_manager:
+            self.rdp_manager.close()
+        if self.ssh_manager:
+            self.ssh_manager.close()
+
     def get_random_ip(self) -> str:
         """Sets self.lan_ip to a random IP. """
         third_octet = random.randint(0, 255)
@@ -102,245 +150,352 @@ class ServerManager:
         self.lan_ip = f"172.16.{third_octet}.{fourth_octet}"
         return self.lan_ip
 
-    def save_results_to_csv(self, filename: str, results: dict) -> None:
-        """Save the results to a CSV file."""
+    def run_operation(self, name: str, operation: Callable[[], Status]) -> CheckResult:
+        """Runs a lifecycle operation and records its outcome and duration."""
+        start = time.monotonic()
+        self.convergence = None
+        with log_context(host=self.host, op=name):
+            status = operation()
+        detail = "time budget exhausted" if status == Status.TIMEOUT else ""
+        if status == Status.FAIL and self.host and self.breaker.is_open(self.host):
+            # The guest could not be reached to verify the operation, say so instead of a plain failure
+            status, detail = Status.UNREACHABLE, self.breaker.describe(self.host)
+        if self.convergence and status != Status.TIMEOUT:
+            converged, elapsed, attempts = self.convergence
+            detail = f"{'converged' if converged == Status.PASS else 'not converged'} after {elapsed:.1f}s ({attempts} checks)"
+        return CheckResult(name, status, time.monotonic() - start, self.host, self.image, detail)
+
+    def save_results_to_csv(self, filename: str, results: Iterable[CheckResult]) -> None:
+        """Save the results to a CSV file, one row per check."""
         with open(filename, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(results.keys())
-            writer.writerow(results.values())
-
-    def _exec_command(self, command: str) -> Optional[str]:
-        """Helper method to execute a command using the established connection."""
+            writer.writerow(["Check", "Status", "Duration", "Host", "Image", "Detail"])
+            for result in results:
+                writer.writerow([result.check, str(result.status), f"{result.duration:.2f}", result.host, result.image, result.detail])
+
+    def _verify(self, check: Callable[[], Status]) -> Status:
+        """
+        Verifies the state a lifecycle operation should have produced. With a converge timeout the
+        check is repeated with backoff (and fresh command outputs) until it passes, and the
+        time-to-converge is kept in self.convergence for the operation's result.
+        """
+        if not self.converge_timeout:
+            return check()
+        status, elapsed, attempts = converge(check, self.converge_timeout, self.deadline,
+                                             before_retry=lambda: self.cache.invalidate(self.host))
+        self.convergence = (status, elapsed, attempts)
+        logger.info(f"{'Converged' if status == Status.PASS else 'Did not converge'} after {elapsed:.1f}s ({attempts} checks)")
+        return status
+
+    def _execute_task(self, command: str) -> Status:
+        """Runs a lifecycle task; whatever it changed on the guest invalidates the cached command outputs."""
+        try:
+            return self.executor.execute_task(command, deadline=self.deadline)
+        finally:
+            self.cache.invalidate(self.host)
+
+    def _exec_command(self, command: str, read_only: bool = False) -> Optional[str]:
+        """
+        Helper method to execute a command using the established connection.
+        Outputs of read-only commands are served from the cache until the next lifecycle task or reconnect.
+        """
+        if read_only:
+            return self.cache.run(self.host, command, self._run_remote)
+        output = self._run_remote(command)
+        self.cache.invalidate(self.host)
+        return output
+
+    def _run_remote(self, command: str) -> Optional[str]:
         if self.os_type is None:
-            print("Error: OS type not determined yet.")
+            logger.error("OS type not determined yet.")
             return None
-        if self.os_type == "windows" and self.rdp_manager:
-            return self.rdp_manager.run_ps(command)
-        elif self.ssh_manager:
-            try:
+        try:
+            if self.os_type == "windows" and self.rdp_manager:
+                return self.rdp_manager.run_ps(command)
+            elif self.ssh_manager:
                 return self.ssh_manager.exec_command(command)
-            except ConnectionResetError as e:
-                print(f"Connection reset during command execution (error: {e}), connection likely dropped.")
-                return None
-        print("Error: No valid connection established.")
+        except ConnectionResetError as e:
+            logger.warning(f"Connection reset during command execution (error: {e}), connection likely dropped.")
+            return None
+        except (DeadlineExceeded, TimeoutError) as e:
+            logger.warning(f"Command did not finish within the time budget: {e}")
+            return None
+        logger.error("No valid connection established.")
         return None
 
-    def poweroff_server(self, machine_uuid: str) -> str:
+    def poweroff_server(self, machine_uuid: str) -> Status:
         """Power off the server."""
-        print("Powering off the server...\n")
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
+        logger.info("Powering off the server...")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" power --state off'
-        return self.executor.execute_task(command)
+        return self._execute_task(command)
 
-    def poweron_server(self, machine_uuid: str) -> str:
+    def poweron_server(self, machine_uuid: str) -> Status:
         """Power on the server."""
-        print("Powering on the server...\n")
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
+        logger.info("Powering on the server...")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" power --state on'
-        return self.executor.execute_task(command)
+        return self._execute_task(command)
 
-    def rename_server(self, machine_uuid: str, machine_name: str) -> str:
+    def rename_server(self, machine_uuid: str, machine_name: str) -> Status:
         """Rename the server."""
-        print("Renaming the server\n")
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
+        logger.info("Renaming the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid {machine_uuid} rename -n {machine_name}{self.index}'
-        return self.executor.execute_task(command)
+        return self._execute_task(command)
 
-    def change_password(self, machine_uuid: str, ip_address: str) -> str:
+    def change_password(self, machine_uuid: str, ip_address: str) -> Status:
         """Change the server password."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password has not been set.")
-            return "❌"
+            logger.error("New password has not been set.")
+            return Status.FAIL
 
-        print("Changing the server password\n")
+        logger.info("Changing the server password")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" password -p {self.new_password}'
-        res = self.executor.execute_task(command)
-        if res == "✅":
+        res = self._execute_task(command)
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection with new password.")
-                return "❌"
-            return "✅"
-        return "❌"
+                logger.error("Failed to update connection with new password.")
+                return Status.FAIL
+            return Status.PASS
+        return Status.FAIL
 
-    def add_ip(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> str:
+    def add_ip(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> Status:
         """Add IP to the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Adding IP to the server\n")
+        logger.info("Adding IP to the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network nic add --ip {self.auto_ip} --mac {mac_address}'
-        res = self.executor.execute_task(command)
+        res = self._execute_task(command)
 
         command2 = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network list | jq -r \'.nics[].ips[] | select(. != "{ip_address}")\''
-        new_ip = self.executor.run_command(command2)
+        new_ip = self.executor.run_command(command2, timeout=self.deadline.timeout(None))
         if new_ip is None:
-            print("Error: Failed to get new IP address.")
-            return "❌"
+            logger.error("Failed to get new IP address.")
+            return Status.FAIL
 
-        if res == "✅":
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after adding IP.")
-                return "❌"
-            ip_exists = self.check_ip_exists(new_ip, ip_address)
-            network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
-            return "✅" if ip_exists == "✅" and network_configuration == "✅" else "❌"
-        return "❌"
-
-    def remove_ip(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> str:
+                logger.error("Failed to update connection after adding IP.")
+                return Status.FAIL
+            def verify() -> Status:
+                ip_exists = self.check_ip_exists(new_ip, ip_address)
+                network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
+                return Status.PASS if ip_exists == Status.PASS and network_configuration == Status.PASS else Status.FAIL
+            return self._verify(verify)
+        return Status.FAIL
+
+    def remove_ip(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> Status:
         """Remove IP from the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Removing IP from the server\n")
+        logger.info("Removing IP from the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network list | jq -r \'.nics[].ips[] | select(. != "{ip_address}")\''
-        new_ip = self.executor.run_command(command)
+        new_ip = self.executor.run_command(command, timeout=self.deadline.timeout(None))
         if new_ip is None:
-            print("Error: Failed to get new IP address.")
-            return "❌"
+            logger.error("Failed to get new IP address.")
+            return Status.FAIL
 
         command2 = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network nic remove-ip --ip {new_ip} --mac {mac_address}'
-        res = self.executor.execute_task(command2)
-        if res == "✅":
+        res = self._execute_task(command2)
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after removing IP.")
-                return "❌"
-            ip_exists = self.check_ip_exists(new_ip, ip_address)
-            network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
-            return "✅" if ip_exists == "❌" and network_configuration == "✅" else "❌"
-        return "❌"
-
-    def remove_nic(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> str:
+                logger.error("Failed to update connection after removing IP.")
+                return Status.FAIL
+            def verify() -> Status:
+                ip_exists = self.check_ip_exists(new_ip, ip_address)
+                network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
+                return Status.PASS if ip_exists == Status.FAIL and network_configuration == Status.PASS else Status.FAIL
+            return self._verify(verify)
+        return Status.FAIL
+
+    def remove_nic(self, machine_uuid: str, mac_address: str, ip_address: str, dns: str, gateway: str, subnet: str) -> Status:
         """Remove NIC from the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Removing NIC from the server\n")
+        logger.info("Removing NIC from the server")
         self.poweroff_server(machine_uuid)
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network list | jq -r \'.nics[] | select(.mac != "{mac_address}") | .mac\''
-        new_mac = self.executor.run_command(command)
+        new_mac = self.executor.run_command(command, timeout=self.deadline.timeout(None))
         if new_mac is None:
-            print("Error: Failed to get new MAC address.")
-            return "❌"
+            logger.error("Failed to get new MAC address.")
+            return Status.FAIL
         command2 = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network nic remove --mac {new_mac}'
-        res = self.executor.execute_task(command2)
-        if res == "✅":
+        res = self._execute_task(command2)
+        if res == Status.PASS:
             self.poweron_server(machine_uuid)
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after removing NIC.")
-                return "❌"
-            nic_exists = self.check_nic_exists(new_mac)
-            network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
-            return "✅" if nic_exists == "❌" and network_configuration == "✅" else "❌"
-        return "❌"
-
-    def add_nic(self, machine_uuid: str, ip_address: str, mac_address: str, dns: str, gateway: str, subnet: str, lan: str) -> str:
+                logger.error("Failed to update connection after removing NIC.")
+                return Status.FAIL
+            def verify() -> Status:
+                nic_exists = self.check_nic_exists(new_mac)
+                network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
+                return Status.PASS if nic_exists == Status.FAIL and network_configuration == Status.PASS else Status.FAIL
+            return self._verify(verify)
+        return Status.FAIL
+
+    def add_nic(self, machine_uuid: str, ip_address: str, mac_address: str, dns: str, gateway: str, subnet: str, lan: str) -> Status:
         """Add NIC to the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Adding NIC to the server\n")
+        logger.info("Adding NIC to the server")
         self.poweroff_server(machine_uuid)
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network add --ip {self.lan_ip} --network {lan}'
-        res = self.executor.execute_task(command)
+        res = self._execute_task(command)
         command2 = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" network list | jq -r \'.nics[] | select(.mac != "{mac_address}") | .mac\''
-        new_mac = self.executor.run_command(command2)
+        new_mac = self.executor.run_command(command2, timeout=self.deadline.timeout(None))
         if new_mac is None:
-            print("Error: Failed to get new MAC address.")
-            return "❌"
-        if res == "✅":
+            logger.error("Failed to get new MAC address.")
+            return Status.FAIL
+        if res == Status.PASS:
             self.poweron_server(machine_uuid)
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after adding NIC.")
-                return "❌"
-            nic_exists = self.check_nic_exists(new_mac)
-            network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
-            return "✅" if nic_exists == "✅" and network_configuration == "✅" else "❌"
-        return "❌"
-
-    def add_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> str:
+                logger.error("Failed to update connection after adding NIC.")
+                return Status.FAIL
+            def verify() -> Status:
+                nic_exists = self.check_nic_exists(new_mac)
+                network_configuration = self.check_network_configuration(ip_address, subnet, gateway, dns)
+                return Status.PASS if nic_exists == Status.PASS and network_configuration == Status.PASS else Status.FAIL
+            return self._verify(verify)
+        return Status.FAIL
+
+    def add_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> Status:
         """Add HD to the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Adding HD to the server\n")
+        logger.info("Adding HD to the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" disk add --size {self.size}'
-        res = self.executor.execute_task(command)
-        if res == "✅":
+        res = self._execute_task(command)
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after adding HD.")
-                return "❌"
-            disk_exists = self.check_disk_exists(ip_address, self.size, disk_size)
-            return "✅" if disk_exists == "✅" else "❌"
-        return "❌"
+                logger.error("Failed to update connection after adding HD.")
+                return Status.FAIL
+            return self._verify(lambda: self.check_disk_exists(ip_address, self.size, disk_size))
+        return Status.FAIL
 
-    def remove_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> str:
+    def remove_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> Status:
         """Remove HD from the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Removing HD from the server\n")
+        logger.info("Removing HD from the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" disk remove -i {self.index}'
-        res = self.executor.execute_task(command)
-        if res == "✅":
+        res = self._execute_task(command)
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after removing HD.")
-                return "❌"
-            disk_exists = self.check_disk_exists(ip_address, 0, disk_size)
-            return "✅" if disk_exists == "✅" else "❌"
-        return "❌"
+                logger.error("Failed to update connection after removing HD.")
+                return Status.FAIL
+            return self._verify(lambda: self.check_disk_exists(ip_address, 0, disk_size))
+        return Status.FAIL
 
-    def resize_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> str:
+    def resize_hd(self, machine_uuid: str, ip_address: str, disk_size: int) -> Status:
         """Resize HD on the server."""
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
-        print("Resizing HD on the server\n")
+        logger.info("Resizing HD on the server")
         size = 100
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" disk resize -i {self.index} --size {size}'
-        res = self.executor.execute_task(command)
-        if res == "✅":
+        res = self._execute_task(command)
+        if res == Status.PASS:
             if not self._update_connection(ip_address, self.new_password):
-                print("Error: Failed to update connection after resizing HD.")
-                return "❌"
-            disk_exists = self.check_disk_exists(ip_address, size, disk_size)
-            return "✅" if disk_exists == "✅" else "❌"
-        return "❌"
+                logger.error("Failed to update connection after resizing HD.")
+                return Status.FAIL
+            return self._verify(lambda: self.check_disk_exists(ip_address, size, disk_size))
+        return Status.FAIL
 
-    def clone_server(self, machine_uuid: str, password: str, machine_name: str) -> str:
+    def clone_server(self, machine_uuid: str, password: str, machine_name: str) -> Status:
         """Clone the server."""
-        print("Cloning the server\n")
+        if self.deadline.expired():
+            logger.error("Time budget exhausted, skipping.")
+            return Status.TIMEOUT
+        logger.info("Cloning the server")
         command = f'{CommandExecutor.MAIN_PY_PATH} server --uuid "{machine_uuid}" clone --password {password}'
-        result = self.executor.run_command(command)
-        print(f"Clone command output: {result}")
+        result = self.executor.run_command(command, timeout=self.deadline.timeout(None))
+        logger.info(f"Clone command output: {result}")
 
         if result is None:
-            print("Error: Clone command failed.")
-            return "❌"
+            logger.error("Clone command failed.")
+            return Status.FAIL
 
-        clone_task_id = self.executor.extract_clone_task_id(machine_name, self.index, timeout=120, interval=10)
+        clone_task_id = self.executor.extract_clone_task_id(machine_name, self.index, timeout=120, interval=10, deadline=self.deadline)
         if clone_task_id:
-            return self.executor.wait_queue(clone_task_id, timeout=900, interval=10)
-
-        print("Error: Failed to extract clone task ID.")
-        return "❌"
+            return self.executor.wait_queue(clone_task_id, timeout=900, interval=10, deadline=self.deadline)
+
+        logger.error("Failed to extract clone task ID.")
+        return Status.FAIL
+
+    def find_clone(self, machine_name: str) -> Optional[Tuple[str, str]]:
+        """Looks up the UUID and IP address of the server created by clone_server."""
+        clone_name = f"{machine_name}{self.index}-clone"
+        output = self.executor.run_command(f'{CommandExecutor.MAIN_PY_PATH} servers list -f "{clone_name}"',
+                                           timeout=self.deadline.timeout(None))
+        try:
+            servers = json.loads(output) if output else []
+        except json.JSONDecodeError:
+            logger.error(f"Non-JSON response from servers list: {output}")
+            return None
+        server = next((server for server in servers if server.get("name") == clone_name), None)
+        if not server or not server.get("id") or not server.get("ips"):
+            logger.error(f"Clone {clone_name} not found in server list")
+            return None
+        return server["id"], server["ips"][0]
 
-    def check_network_configuration(self, ip_address: str, subnet: str, gateway: str, dns: str) -> str:
+    def check_network_configuration(self, ip_address: str, subnet: str, gateway: str, dns: str) -> Status:
         """Checks if the network configuration matches the given parameters."""
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
         if self.os_type is None:
-            print("Error: OS type not determined yet.")
-            return "❌"
+            logger.error("OS type not determined yet.")
+            return Status.FAIL
 
         if not self._update_connection(ip_address, self.new_password):
-            print("Error: Failed to update connection for network check.")
-            return "❌"
+            logger.error("Failed to update connection for network check.")
+            return Status.FAIL
 
         cidr = sum(bin(int(octet)).count('1') for octet in subnet.split('.'))
         if self.os_type == "windows":
@@ -357,29 +512,29 @@ class ServerManager:
 
             command3 = f"resolvectl status | grep -i {dns} ; grep -i {dns} {self.dns_path}"
 
-        result = self._exec_command(command)
-        result2 = self._exec_command(command2)
-        result3 = self._exec_command(command3)
+        result = self._exec_command(command, read_only=True)
+        result2 = self._exec_command(command2, read_only=True)
+        result3 = self._exec_command(command3, read_only=True)
 
         if result is None or result2 is None or result3 is None:
-            print("Error: Failed to execute network check commands.")
-            return "❌"
-        print(f"Matched!" if result and result2 and result3 else "No match.")
-        return "✅" if result and result2 and result3 else "❌"
+            logger.error("Failed to execute network check commands.")
+            return Status.FAIL
+        logger.info("Matched!" if result and result2 and result3 else "No match.")
+        return Status.PASS if result and result2 and result3 else Status.FAIL
 
-    def check_ip_exists(self, new_ip: str, ip_address: str) -> str:
+    def check_ip_exists(self, new_ip: str, ip_address: str) -> Status:
         """Checks if the given IP address exists."""
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
         if self.os_type is None:
-            print("Error: OS type not determined yet.")
-            return "❌"
+            logger.error("OS type not determined yet.")
+            return Status.FAIL
 
         if not self._update_connection(ip_address, self.new_password):
-            print("Error: Failed to update connection for IP check.")
-            return "❌"
+            logger.error("Failed to update connection for IP check.")
+            return Status.FAIL
 
         if self.os_type == "windows":
             command = f"Get-NetIPAddress | Where-Object {{ $_.IPAddress -eq '{new_ip}' }}"
@@ -389,22 +544,22 @@ class ServerManager:
             else:
                 command = f"grep -i '{new_ip}' {self.network_path}"
 
-        result = self._exec_command(command)
+        result = self._exec_command(command, read_only=True)
         if result is None:
-            print("Error: Command execution failed.")
-            return "❌"
-        print(f"Matched!" if result.strip() else "No match.")
-        return "✅" if result else "❌"
+            logger.error("Command execution failed.")
+            return Status.FAIL
+        logger.info("Matched!" if result.strip() else "No match.")
+        return Status.PASS if result else Status.FAIL
 
-    def check_nic_exists(self, new_mac: str) -> str:
+    def check_nic_exists(self, new_mac: str) -> Status:
         """Checks if the given MAC address exists."""
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
         if self.os_type is None:
-            print("Error: OS type not determined yet.")
-            return "❌"
+            logger.error("OS type not determined yet.")
+            return Status.FAIL
 
         if self.os_type == "windows":
             new_mac = new_mac.strip().upper().replace(":", "-")
@@ -415,54 +570,54 @@ class ServerManager:
             else:
                 command = f"grep -i '{new_mac}' {self.network_path}"
 
-        result = self._exec_command(command)
+        result = self._exec_command(command, read_only=True)
         if result is None:
-            print("Error: Failed to execute command.")
-            return "❌"
-        print(f"Matched!" if result else "No match.")
-        return "✅" if result else "❌"
+            logger.error("Failed to execute command.")
+            return Status.FAIL
+        logger.info("Matched!" if result else "No match.")
+        return Status.PASS if result else Status.FAIL
 
-    def check_disk_exists(self, ip_address: str, size: int, disk_size: int) -> str:
+    def check_disk_exists(self, ip_address: str, size: int, disk_size: int) -> Status:
         """Checks disk size matches expected total in GB."""
         if not self.new_password:
-            print("Error: New password is not set.")
-            return "❌"
+            logger.error("New password is not set.")
+            return Status.FAIL
 
         if self.os_type is None:
-            print("Error: OS type not determined yet.")
-            return "❌"
+            logger.error("OS type not determined yet.")
+            return Status.FAIL
 
         if not self._update_connection(ip_address, self.new_password):
-            print("Error: Failed to update connection for disk checking.")
-            return "❌"
+            logger.error("Failed to update connection for disk checking.")
+            return Status.FAIL
 
         total_gb = 0
         if self.os_type in ["ubuntu", "debian", "rhel", "centos", "almalinux", "rocky", "linuxmint", "archlinux"]:
             command = "lsblk -dnbo SIZE"
-            result = self._exec_command(command)
+            result = self._exec_command(command, read_only=True)
             if result is None:
-                print("Error: Failed to execute lsblk.")
-                return "❌"
+                logger.error("Failed to execute lsblk.")
+                return Status.FAIL
             stdout = result.strip()
             if not stdout:
-                print("Error: No output received from lsblk.")
-                return "❌"
+                logger.error("No output received from lsblk.")
+                return Status.FAIL
             try:
                 total_gb = sum(int(size) for size in stdout.split()) // (1024 ** 3)
             except Exception as e:
-                print(f"Error processing lsblk output: {e}")
-                return "❌"
+                logger.error(f"Error processing lsblk output: {e}")
+                return Status.FAIL
 
         elif self.os_type == "freebsd":
             command = "geom disk list"
-            result = self._exec_command(command)
+            result = self._exec_command(command, read_only=True)
             if result is None:
-                print("Error: Failed to execute geom disk list.")
-                return "❌"
+                logger.error("Failed to execute geom disk list.")
+                return Status.FAIL
             stdout = result.strip()
             if not stdout:
-                print("Error: No output received from geom disk list.")
-                return "❌"
+                logger.error("No output received from geom disk list.")
+                return Status.FAIL
             total_gb = 0
             lines = stdout.splitlines()
             current_disk = None
@@ -477,25 +632,25 @@ class ServerManager:
                         disk_gb = size_bytes // (1024 ** 3)
                         total_gb += disk_gb
                     except Exception as e:
-                        print(f"Error processing geom output: {e}")
-                        return "❌"
+                        logger.error(f"Error processing geom output: {e}")
+                        return Status.FAIL
 
         elif self.os_type == "windows":
             command = "(Get-PhysicalDisk | ForEach-Object { $_.Size } | Measure-Object -Sum).Sum"
-            result = self._exec_command(command)
+            result = self._exec_command(command, read_only=True)
             if result is None or not result.strip():
-                print("Error: Failed to execute PowerShell command for disk checking.")
-                return "❌"
+                logger.error("Failed to execute PowerShell command for disk checking.")
+                return Status.FAIL
             try:
                 total_gb = int(result.strip()) // (1024 ** 3)
             except ValueError as e:
-                print(f"Error processing PowerShell result: {e}")
-                return "❌"
+                logger.error(f"Error processing PowerShell result: {e}")
+                return Status.FAIL
 
         else:
-            print(f"OS type {self.os_type} not supported for disk checking.")
-            return "❌"
+            logger.warning(f"OS type {self.os_type} not supported for disk checking.")
+            return Status.FAIL
 
         expected_total_gb = int(disk_size) + int(size)
-        print(f"Actual total partition size: {total_gb} GB; Expected total: {expected_total_gb} GB")
-        return "✅" if abs(total_gb - expected_total_gb) <= 1 else "❌"
+        logger.info(f"Actual total partition size: {total_gb} GB; Expected total: {expected_total_gb} GB")
+        return Status.PASS if abs(total_gb - expected_total_gb) <= 1 else Status.FAIL
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import os
+import time
+from rich.console import Console
+from rich.table import Table
+from Modules.history import ResultHistory, regressions, summarize
+from Modules.log import setup_logging
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Percentiles, failure rates and regressions across the result history.")
+    parser.add_argument("--history", default=os.getenv("RESULT_HISTORY"), required=not os.getenv("RESULT_HISTORY"),
+                        help="History directory written by --history of main.py, os_check.py and catalog_check.py.")
+    parser.add_argument("--by", default="image,check",
+                        help="Comma-separated columns to group by: image, check, host, os_type.")
+    parser.add_argument("--since", type=float, default=None, metavar="DAYS", help="Only use runs of the last DAYS days.")
+    parser.add_argument("--percentiles", default="50,95", help="Comma-separated duration percentiles.")
+    parser.add_argument("--regressions", action="store_true",
+                        help="List groups whose median duration grew in the recent window instead.")
+    parser.add_argument("--window", type=float, default=7, metavar="DAYS", help="Recent window of --regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown --regressions reports (0.2 = 20%%).")
+    parser.add_argument("--min-runs", type=int, default=5, help="Passed runs both periods need for --regressions.")
+    parser.add_argument("--compact", action="store_true", help="Merge the history chunks into one file first.")
+    return parser.parse_args()
+
+def main():
+    setup_logging(rich=False)
+    args = parse_arguments()
+    history = ResultHistory(args.history)
+    if args.compact:
+        history.compact()
+
+    columns = history.load(since=time.time() - args.since * 86400 if args.since else None)
+    by = [name.strip() for name in args.by.split(",")]
+    logging.info(f"Loaded {len(columns['run_at'])} results from {args.history}")
+
+    table = Table(show_header=True, header_style="bold red")
+    for name in by:
+        table.add_column(name)
+    if args.regressions:
+        rows = regressions(columns, by, args.window * 86400, args.threshold, args.min_runs)
+        for column in ("Baseline p50 (s)", "Recent p50 (s)", "Change"):
+            table.add_column(column, justify="right")
+        for row in rows:
+            table.add_row(*(row[name] for name in by), f"{row['baseline_p50']:.2f}", f"{row['recent_p50']:.2f}",
+                          f"+{row['change']:.0%}")
+    else:
+        qs = [float(q) for q in args.percentiles.split(",")]
+        rows = summarize(columns, by, qs)
+        for column in ("Runs", "Failure rate", *(f"p{q:g} (s)" for q in qs)):
+            table.add_column(column, justify="right")
+        for row in rows:
+            table.add_row(*(row[name] for name in by), str(row["runs"]), f"{row['failure_rate']:.1%}",
+                          *(f"{row[f'p{q:g}']:.2f}" for q in qs))
+    Console().print(table)
+
+if __name__ == "__main__":
+    main()
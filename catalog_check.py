@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import os
+import sys
+from ModulesInstaller import load_catalog, validate_catalog
+from ModulesInstaller.json_loader import load_json
+from Modules import ReportGenerator, TableType
+from Modules.deadline import Deadline
+from Modules.log import setup_logging
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate the whole application catalog against pre-provisioned hosts.")
+    parser.add_argument("--hosts", required=True,
+                        help="JSON file mapping image name to an IP or to {host, user, password}.")
+    parser.add_argument("--catalog", default=None, help="Path of apps_services.json (defaults to the Jenkins workspace copy).")
+    parser.add_argument("--user", default=os.getenv("USER"), help="Default SSH user for hosts without one.")
+    parser.add_argument("--password", default=os.getenv("PASSWORD"), help="Default SSH password for hosts without one.")
+    parser.add_argument("--filter", default=None, help="Only check applications whose name contains this string.")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes (defaults to CPU count).")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent applications per worker process.")
+    parser.add_argument("--broker-socket", default=os.getenv("SSH_BROKER_SOCKET"), help="SSH broker socket path (optional).")
+    parser.add_argument("--host-budget", type=float, default=None, help="Time budget in seconds per application host.")
+    parser.add_argument("--run-budget", type=float, default=None, help="Time budget in seconds for the whole catalog run.")
+    parser.add_argument("--history", default=os.getenv("RESULT_HISTORY"),
+                        help="Append the results to this columnar history directory (see analyze_history.py).")
+    parser.add_argument("--output", default=None, help="Write the aggregated results to this JSON file.")
+    return parser.parse_args()
+
+def load_targets(args: argparse.Namespace) -> dict:
+    targets = {}
+    for name, target in load_json(args.hosts).items():
+        if isinstance(target, str):
+            target = {"host": target}
+        targets[name] = {
+            "host": target["host"].strip(),
+            "user": target.get("user", args.user),
+            "password": target.get("password", args.password),
+            "broker_socket": args.broker_socket,
+        }
+    return targets
+
+def main():
+    setup_logging(rich=False)
+    args = parse_arguments()
+
+    apps = load_catalog(args.catalog)
+    if args.filter:
+        apps = [app for app in apps if args.filter in app["name"]]
+    targets = load_targets(args)
+    logging.info(f"Validating {len(apps)} applications against {len(targets)} hosts")
+
+    results = validate_catalog(apps, targets, args.processes, args.threads,
+                               run_deadline=Deadline(args.run_budget), host_budget=args.host_budget)
+
+    failed = []
+    for name in sorted(results):
+        result = results[name]
+        if "error" in result:
+            logging.error(f"{name}: {result['error']}")
+            failed.append(name)
+            continue
+        print(f"\n{name}")
+        installer_report = ReportGenerator(TableType.INSTALLER)
+        web_report = ReportGenerator(TableType.WEB)
+        for row in result["installer"]:
+            installer_report.add_installer_row(*row)
+        for port, v4_port, v6_port, http_status, https_status in result["web"]:
+            # The worker already matched the firewall ports to the row
+            web_report.add_web_row(port, [v4_port] if v4_port else [], [v6_port] if v6_port else [],
+                                   http_status, https_status)
+        installer_report.display_tables()
+        web_report.display_tables()
+        if any(not record.ok for record in result["records"] if record.check in ("installed", "enabled")):
+            failed.append(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({name: [record.to_dict() for record in result.get("records", [])] or result
+                       for name, result in results.items()}, f, indent=2, ensure_ascii=False)
+
+    if args.history:
+        # Imported here so numpy is only needed when a history is kept
+        from Modules.history import ResultHistory
+        ResultHistory(args.history).append(record for result in results.values() for record in result.get("records", []))
+
+    logging.info(f"{len(results) - len(failed)}/{len(results)} applications passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -16,4 +16,4 @@ fi
 
 # Install Python packages using pip
 echo "Installing Python dependencies..."
-sudo apt install -y python3-paramiko python3-requests python3-rich python3-winrm
+sudo apt install -y python3-paramiko python3-requests python3-rich python3-winrm python3-numpy
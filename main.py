@@ -1,63 +1,262 @@
 #!/usr/bin/env python3
 
-from ModulesInstaller import ServiceChecker, parse_config_args, load_app_config
-from Modules import SSHManager, ReportGenerator, TableType
+from ModulesInstaller import ServiceChecker, ServiceMonitor, parse_config_args, load_app_config
+from Modules import SSHManager, ReportGenerator, TableType, ResultStore, setup_logging, log_context
+from Modules.deadline import Deadline
+from Modules.metrics import metrics
+from Modules.profiling import Profiler
+from Modules.result import CheckResult, Status
+from Modules.ssh_profile import default_profile
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import sys
+import time
 
-def main():
-    # Parse command-line arguments or environment variables
-    config = parse_config_args()
+# Pipelined mode: the SSH connect, the address lookup and the web probes share this many threads
+PIPELINE_WORKERS = 8
 
-    logging.info("Starting the main process")
+def run_installer_checks(service_checker, config, config_data, installer_report, store=None) -> list:
+    # Process each service for the INSTALLER table
+    records = []
+    for service in config_data.get("services", []):
+        definition_hash = ResultStore.definition_hash(service)
+        if store and config.incremental:
+            cached = store.cached_row(config.name, "installer", service["name"], config.host, definition_hash, config.ttl)
+            if cached:
+                logging.info(f"Skipping {service['name']}, last result is still valid")
+                installer_report.add_installer_row(*cached)
+                continue
+
+        results = service_checker.process_service(service, installer_report)
+        records.extend(results)
+        # A run cut short by the time budget says nothing about the service, so it is not stored
+        if store and not any(result.status == Status.TIMEOUT for result in results):
+            installed, enabled, *listening = results
+            listeners = [service_checker.listener_label(result.check.split(':', 1)[1], result) for result in listening]
+            store.record(config.name, "installer", service["name"], config.host, definition_hash,
+                         all(result.ok for result in results), sum(result.duration for result in results),
+                         [service["name"], str(installed.status), str(enabled.status), listeners])
+    return records
 
+def web_definition_hash(config, service):
+    # Dual-stack rows carry IPv6 statuses, so the probe mode is part of what a stored row was checked against
+    if config.dual_stack:
+        return ResultStore.definition_hash({**service, "_probe": "dual-stack"})
+    return ResultStore.definition_hash(service)
+
+def cached_web_row(config, store, service, port):
+    """Returns the stored (http, https[, http v6, https v6]) statuses of a port if incremental mode may reuse them."""
+    if not (store and config.incremental):
+        return None
+    check_name = f"{service['name']}:{port}"
+    return store.cached_row(config.name, "web", check_name, config.host, web_definition_hash(config, service), config.ttl)
+
+def probe_port(service_checker, config, port, addresses=None):
+    # addresses: optional resolve_addresses result shared by the dual-stack probes of all ports
+    start = time.monotonic()
+    with log_context(host=config.host, op="Web"):
+        if config.dual_stack:
+            connectivity_results = service_checker.check_web_access_dual(config.host, [port], config.host_v6,
+                                                                         addresses=addresses)
+        else:
+            connectivity_results = service_checker.check_web_access(config.host, [port])
+    return connectivity_results, time.monotonic() - start
+
+def connect_ssh(config, deadline):
     # Initialize SSHManager with parsed configuration
-    ssh_manager = SSHManager(config.host, config.user, config.password)
+    with log_context(host=config.host, op="Connect"):
+        return SSHManager(config.host, config.user, config.password, broker_socket=config.broker_socket,
+                          deadline=deadline)
+
+def pipelined_startup(config, deadline, store, pool):
+    """
+    Overlaps the startup phases: the SSH handshake runs in the background while the app config
+    is loaded and, in dual-stack mode, the probe addresses resolved once for all ports. The external
+    web probes (which need no SSH) start before the connection is up, unless the IPv6 address has
+    to be read from the guest, and are joined in run_web_checks at report time.
+    Returns the SSH manager, the app config, the service checker and the {port: Future} probes.
+    """
+    connecting = pool.submit(connect_ssh, config, deadline)
+    service_checker = ServiceChecker(None, deadline, host=config.host, image=config.name)
+    resolving = pool.submit(service_checker.resolve_addresses, config.host, config.host_v6) if config.dual_stack else None
+    config_data = load_app_config(config.name)
+    addresses = resolving.result() if resolving else None
+    if addresses and not addresses["v6"]:
+        # The guest's own address is the last resort and needs SSH, so the probes wait for the connection
+        ssh_manager = connecting.result()
+        if ssh_manager.is_connected():
+            service_checker.ssh = ssh_manager
+            addresses["v6"] = service_checker.guest_v6_address()
+
+    probes = {}
+    for service in (config_data or {}).get("services", []):
+        for port_info in service.get("ports", []):
+            port = port_info.get("port")
+            if port and port not in probes and not cached_web_row(config, store, service, port):
+                probes[port] = pool.submit(probe_port, service_checker, config, port, addresses)
+
+    ssh_manager = connecting.result()
+    service_checker.ssh = ssh_manager
+    return ssh_manager, config_data, service_checker, probes
+
+def run_web_checks(service_checker, config, config_data, web_report, store=None, probes=None) -> list:
+    # Process each service for the WEB table
+    # probes: optional {port: Future} of probe_port calls started ahead of time (pipelined mode)
+    v4_ports = service_checker.check_open_ports_v4()
+    v6_ports = service_checker.check_open_ports_v6()
+
+    # Dual-stack probes of all ports share one lookup, made when the first port needs it
+    addresses = None
+
+    local_results = {}
+    if config.diagnose:
+        # One remote command probes every port from inside the guest, to tell "down" from "filtered"
+        ports = [port_info.get("port") for service in config_data.get("services", [])
+                 for port_info in service.get("ports", [])
+                 if port_info.get("port") and not cached_web_row(config, store, service, port_info.get("port"))]
+        local_results = service_checker.check_local_access(sorted(set(ports)))
+
+    records = []
+    for service in config_data.get("services", []):
+        definition_hash = web_definition_hash(config, service)
+        for port_info in service.get("ports", []):
+            port = port_info.get("port")
+            if port:  # Ensure the port is defined
+                check_name = f"{service['name']}:{port}"
+                cached = cached_web_row(config, store, service, port)
+                if cached:
+                    logging.info(f"Skipping web check for port {port}, last result is still valid")
+                    http_status, https_status, *v6_statuses = cached
+                    diagnosis = None
+                else:
+                    if probes and port in probes:
+                        connectivity_results, duration = probes[port].result()
+                    else:
+                        if config.dual_stack and addresses is None:
+                            addresses = service_checker.resolve_addresses(config.host, config.host_v6)
+                        connectivity_results, duration = probe_port(service_checker, config, port, addresses)
+                    port_results = connectivity_results.get(port, {})
+                    http_status = port_results.get("http", Status.FAIL)
+                    https_status = port_results.get("https", Status.FAIL)
+                    # Only present in dual-stack mode when the host has an IPv6 address
+                    v6_statuses = [port_results[key] for key in ("http_v6", "https_v6") if key in port_results]
+                    for key, status in port_results.items():
+                        check = key.replace("_v6", "6")
+                        records.append(CheckResult(f"{check}:{port}", status, duration, config.host, config.name, service["name"]))
+                    diagnosis = None
+                    if config.diagnose:
+                        local = local_results.get(port)
+                        diagnosis = service_checker.diagnose(port_results, local, service_checker.answers.get(port))
+                        if local is not None:
+                            records.append(CheckResult(f"local:{port}", Status.from_bool(local["tcp"]), 0.0,
+                                                       config.host, config.name, f"{service['name']}: {diagnosis}"))
+                    if store:
+                        store.record(config.name, "web", check_name, config.host, definition_hash,
+                                     Status.PASS in (http_status, https_status, *v6_statuses), duration,
+                                     [str(status) for status in (http_status, https_status, *v6_statuses)])
+                web_report.add_web_row(port, v4_ports, v6_ports, http_status, https_status, *v6_statuses,
+                                       diagnosis=diagnosis)
+    return records
+
+def run(config, profiler):
+    logging.info("Starting the main process")
+    metrics.set_labels(image=config.name)
+    default_profile.configure(config.ssh_profile, config.ssh_key)
+    if config.metrics_port:
+        metrics.serve(config.metrics_port)
+
+    if config.incremental and not config.store:
+        logging.error("--incremental requires --store")
+        sys.exit(1)
+    store = ResultStore(config.store) if config.store else None
+
+    deadline = Deadline(config.run_budget).child(config.host_budget)
+
+    if config.pipelined:
+        pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS)
+        with profiler.phase("Startup (pipelined)"):
+            ssh_manager, config_data, service_checker, probes = pipelined_startup(config, deadline, store, pool)
+    else:
+        pool, probes = None, None
+        with profiler.phase("Connect"):
+            ssh_manager = connect_ssh(config, deadline)
+        # Load the JSON configuration
+        with profiler.phase("Config load"):
+            config_data = load_app_config(config.name) if ssh_manager.is_connected() else None
+        # Initialize service checker
+        service_checker = ServiceChecker(ssh_manager, deadline, host=config.host, image=config.name)
 
     if not ssh_manager.is_connected():
         logging.error("SSH connection failed")
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if config.metrics_file:
+            metrics.write(config.metrics_file)
         return
     logging.info("SSH connection established successfully")
 
-    # Load the JSON configuration
-    config_data = load_app_config(config.name)
-
     if config_data is None:
         logging.error("Config is None, check the JSON loading function.")
         sys.exit(1)
 
     logging.info("JSON file loaded successfully")
 
-    # Initialize service checker
-    service_checker = ServiceChecker(ssh_manager)
-
     # Create report generators
     installer_report = ReportGenerator(TableType.INSTALLER)
-    web_report = ReportGenerator(TableType.WEB)
+    web_report = ReportGenerator(TableType.WEB, dual_stack=config.dual_stack, diagnose=config.diagnose)
 
-    # Process each service for the INSTALLER table
-    for service in config_data.get("services", []):
-        service_checker.process_service(service, installer_report)
+    with profiler.phase("Installer checks"), log_context(host=config.host, op="Installer"):
+        records = run_installer_checks(service_checker, config, config_data, installer_report, store)
+    with profiler.phase("Web probes"), log_context(host=config.host, op="Web"):
+        records += run_web_checks(service_checker, config, config_data, web_report, store, probes)
+    if pool:
+        pool.shutdown()
 
-    # Process each service for the WEB table
-    v4_ports = service_checker.check_open_ports_v4()
-    v6_ports = service_checker.check_open_ports_v6()
+    # Display the reports
+    with profiler.phase("Report"):
+        installer_report.display_tables()
+        web_report.display_tables()
 
-    for service in config_data.get("services", []):
-        for port_info in service.get("ports", []):
-            port = port_info.get("port")
-            if port:  # Ensure the port is defined
-                connectivity_results = service_checker.check_web_access(config.host, [port])
-                http_status = connectivity_results.get(port, {}).get("http", "❌")
-                https_status = connectivity_results.get(port, {}).get("https", "❌")
-                web_report.add_web_row(port, v4_ports, v6_ports, http_status, https_status)
+    failed = [record for record in records if not record.ok]
+    logging.info(f"{len(records) - len(failed)}/{len(records)} checks passed")
+    logging.info(f"Command cache: {service_checker.cache.stats()}")
+    logging.info(f"SSH handshakes: {default_profile.stats()}")
 
-    # Display the reports
-    installer_report.display_tables()
-    web_report.display_tables()
+    if config.metrics_file:
+        metrics.write(config.metrics_file)
+    if config.history:
+        # Imported here so numpy is only needed when a history is kept
+        from Modules.history import ResultHistory
+        ResultHistory(config.history).append(records)
+
+    if store:
+        logging.info(f"Pass rate for {config.name}: {store.pass_rate(config.name)}")
+        store.close()
+
+    if config.watch:
+        logging.info(f"Watching services every {config.watch} seconds")
+        monitor = ServiceMonitor(
+            service_checker, config_data.get("services", []), config.watch,
+            reconnect=lambda: SSHManager(config.host, config.user, config.password, broker_socket=config.broker_socket),
+        )
+        with profiler.phase("Watch"), log_context(host=config.host, op="Watch"):
+            monitor.run()
+
+    # Close the SSH connection (the monitor may have replaced it after a reconnect)
+    service_checker.ssh.close()
+
+def main():
+    # Parse command-line arguments or environment variables
+    config = parse_config_args()
+    setup_logging(json_file=config.log_json)
 
-    # Close the SSH connection
-    ssh_manager.close()
+    profiler = Profiler(config.profile)
+    profiler.start()
+    try:
+        run(config, profiler)
+    finally:
+        profiler.stop()
+        profiler.write(config.name or "main")
 
 if __name__ == "__main__":
     main()
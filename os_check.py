@@ -1,47 +1,135 @@
 #!/usr/bin/env python3
 
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s %(filename)s:%(lineno)d %(message)s',
-    datefmt='[%H:%M:%S]'
-)
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from ModulesOS.args_parser import parse_arguments
 from ModulesOS.command_executor import CommandExecutor
 from ModulesOS.server_manager import ServerManager
 from Modules.report import ReportGenerator, TableType
+from Modules.deadline import Deadline
+from Modules.log import setup_logging, log_context
+from Modules.metrics import metrics
+from Modules.profiling import Profiler
+from Modules.result import CheckResult, Status
+from Modules.ssh_profile import default_profile
 
-def main():
+def clone_and_verify(args, executor, deadline, source_os, profiler) -> List[CheckResult]:
+    """
+    Clones the server and runs the connection checks against the clone. Runs on its own
+    ServerManager in the background while the original continues its lifecycle operations.
+    """
+    clone_manager = ServerManager(executor, broker_socket=args.broker_socket, deadline=deadline,
+                                  image=args.image or args.machine_name, converge_timeout=args.converge)
+    # Until the clone exists, its operations are logged against the source server
+    clone_manager.host = args.ip
+    with profiler.phase("Clone"):
+        results = [clone_manager.run_operation("Clone", lambda: clone_manager.clone_server(args.uuid, args.password, args.machine_name))]
+    if results[0].status != Status.PASS:
+        results.append(CheckResult("Clone Connect", results[0].status, 0.0, None, clone_manager.image, "clone not created"))
+        return results
 
-    args = parse_arguments()
+    def connect_clone() -> Status:
+        clone = clone_manager.find_clone(args.machine_name)
+        if not clone:
+            return Status.FAIL
+        if not clone_manager.set_connection_managers(clone[1], args.password, args.ostype):
+            return Status.FAIL
+        if source_os and clone_manager.os_type != source_os:
+            logging.error(f"Clone reports OS '{clone_manager.os_type}', the source '{source_os}'")
+            return Status.FAIL
+        return Status.PASS
+
+    with profiler.phase("Clone Connect"):
+        results.append(clone_manager.run_operation("Clone Connect", connect_clone))
+    clone_manager.close()
+    return results
+
+def run(args, profiler):
     args.mac = args.mac.lower()
     executor = CommandExecutor()
-    server_manager = ServerManager(executor)
+    metrics.set_labels(image=args.image or args.machine_name)
+    default_profile.configure(args.ssh_profile, args.ssh_key)
+    deadline = Deadline(args.run_budget).child(args.host_budget)
+    server_manager = ServerManager(executor, broker_socket=args.broker_socket, deadline=deadline,
+                                   image=args.image or args.machine_name, converge_timeout=args.converge)
 
-    connection_success = server_manager.set_connection_managers(args.ip, args.password, args.ostype)
+    with profiler.phase("Connect"), log_context(host=args.ip, op="Connect"):
+        connection_success = server_manager.set_connection_managers(args.ip, args.password, args.ostype)
     if not connection_success:
-        print("Error: Failed to establish connection to the server.")
+        logging.error("Failed to establish connection to the server.")
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
         sys.exit(1)
 
-    results = {
-        "Rename": server_manager.rename_server(args.uuid, args.machine_name),
-        "Change Password": server_manager.change_password(args.uuid, args.ip),
-        "Add IP": server_manager.add_ip(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet),
-        "Remove IP": server_manager.remove_ip(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet),
-        "Add NIC": server_manager.add_nic(args.uuid, args.ip, args.mac, args.dns, args.gateway, args.subnet, args.lan),
-        "Remove NIC": server_manager.remove_nic(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet),
-        "Add HD": server_manager.add_hd(args.uuid, args.ip, args.disks),
-        "Resize HD": server_manager.resize_hd(args.uuid, args.ip, args.disks),
-        "Remove HD": server_manager.remove_hd(args.uuid, args.ip, args.disks),
-    }
-
-    report = ReportGenerator(TableType.OS)
-    report.add_os_row(*results.values())
-    report.display_tables()
+    operations = [
+        ("Rename", lambda: server_manager.rename_server(args.uuid, args.machine_name)),
+        ("Change Password", lambda: server_manager.change_password(args.uuid, args.ip)),
+        ("Add IP", lambda: server_manager.add_ip(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet)),
+        ("Remove IP", lambda: server_manager.remove_ip(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet)),
+        ("Add NIC", lambda: server_manager.add_nic(args.uuid, args.ip, args.mac, args.dns, args.gateway, args.subnet, args.lan)),
+        ("Remove NIC", lambda: server_manager.remove_nic(args.uuid, args.mac, args.ip, args.dns, args.gateway, args.subnet)),
+        ("Add HD", lambda: server_manager.add_hd(args.uuid, args.ip, args.disks)),
+        ("Resize HD", lambda: server_manager.resize_hd(args.uuid, args.ip, args.disks)),
+        ("Remove HD", lambda: server_manager.remove_hd(args.uuid, args.ip, args.disks)),
+    ]
+
+    results = []
+    clone_job = None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        for name, operation in operations:
+            with profiler.phase(name):
+                results.append(server_manager.run_operation(name, operation))
+            if name == "Rename" and args.clone:
+                rename = results[-1]
+                if rename.status == Status.PASS:
+                    # The clone is named after the renamed server; from here on it builds alongside the remaining operations
+                    clone_job = pool.submit(clone_and_verify, args, executor, deadline, server_manager.os_type, profiler)
+                else:
+                    # find_clone looks the clone up by the new name, so it could not be verified
+                    results += [CheckResult(check, rename.status, 0.0, None, server_manager.image, "skipped: rename failed")
+                                for check in ("Clone", "Clone Connect")]
+        if clone_job:
+            with profiler.phase("Clone (remaining wait)"):
+                results += clone_job.result()
+
+    logging.info(f"Command cache: {server_manager.cache.stats()}")
+    logging.info(f"SSH handshakes: {default_profile.stats()}")
+    skipped = [result.check for result in results if result.status == Status.TIMEOUT]
+    if skipped:
+        logging.warning(f"Time budget exhausted, skipped: {', '.join(skipped)}")
+    unreachable = [result.check for result in results if result.status == Status.UNREACHABLE]
+    if unreachable:
+        logging.warning(f"Host unreachable, not verified: {', '.join(unreachable)}")
+
+    with profiler.phase("Report"):
+        report = ReportGenerator(TableType.OS, clone=args.clone)
+        report.add_os_results(results)
+        report.display_tables()
 
     result_filename = f"{args.machine_name}_results.csv"
     server_manager.save_results_to_csv(result_filename, results)
+    if args.history:
+        # Imported here so numpy is only needed when a history is kept
+        from Modules.history import ResultHistory
+        ResultHistory(args.history).append(results, os_type=server_manager.os_type)
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+    server_manager.close()
+
+def main():
+    args = parse_arguments()
+    setup_logging(rich=False, json_file=args.log_json)
+
+    profiler = Profiler(args.profile)
+    profiler.start()
+    try:
+        run(args, profiler)
+    finally:
+        profiler.stop()
+        # Next to <machine>_results.csv
+        profiler.write(args.machine_name)
 
 if __name__ == "__main__":
     main()
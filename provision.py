@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import os
+import sys
+from ModulesOS.command_executor import CommandExecutor
+from ModulesOS.concurrency import TARGET_LATENCY_SHARE, AdaptiveLimiter
+from ModulesOS.provisioner import Provisioner
+from Modules.deadline import Deadline
+from Modules.log import setup_logging
+from Modules.metrics import metrics
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Provision servers for many images at once.")
+    parser.add_argument("--images", required=True, help="Comma-separated image names")
+    parser.add_argument("--datacenter", "-dc", required=True, help="Datacenter")
+    parser.add_argument("--password", "-p", default=os.getenv("PASSWORD"), help="Machine Password")
+    parser.add_argument("--disks", "-d", type=int, default=20, help="Disk Size (in GB)")
+    parser.add_argument("--cpu", default="1A", help="CPU cores")
+    parser.add_argument("--ram", type=int, default=2048, help="Memory (in MB)")
+    parser.add_argument("--prefix", default="OMC-InstallerOS-Automation", help="Machine name prefix")
+    parser.add_argument("--config", default="config.json", help="CLI config file")
+    parser.add_argument("--task-timeout", type=int, default=1500, help="Queue wait timeout (in seconds) of each create task")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Upper bound of concurrent create tasks")
+    parser.add_argument("--run-budget", type=float, default=None, help="Time budget in seconds for the whole run (optional)")
+    parser.add_argument("--output", default="hosts.json", help="Where to write the server records")
+    parser.add_argument("--metrics-file", default=os.getenv("METRICS_FILE"), help="Write OpenMetrics task counters and latencies to this file")
+    return parser.parse_args()
+
+def main():
+    setup_logging(rich=False)
+    args = parse_arguments()
+    images = [image.strip() for image in args.images.split(",") if image.strip()]
+
+    CommandExecutor.limiter = AdaptiveLimiter(target_latency=args.task_timeout * TARGET_LATENCY_SHARE,
+                                              initial=3, maximum=args.max_concurrency)
+    provisioner = Provisioner(CommandExecutor(), args.datacenter, args.config, Deadline(args.run_budget))
+    records = provisioner.provision(images, args.prefix, args.password, args.disks, args.cpu, args.ram,
+                                    timeout=args.task_timeout)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({image: record.to_dict() for image, record in records.items() if record}, f, indent=2)
+
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+
+    failed = [image for image, record in records.items() if record is None]
+    logging.info(f"{len(images) - len(failed)}/{len(images)} servers ready, records written to {args.output}")
+    if failed:
+        logging.error(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import os
+from Modules.log import setup_logging
+from Modules.ssh_profile import ConnectionProfile, benchmark, default_profile
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark SSH kex/cipher/compression choices and write a connection profile.")
+    parser.add_argument("--host", required=True, help="Host to benchmark against.")
+    parser.add_argument("--user", default="root", help="SSH user.")
+    parser.add_argument("--password", default=os.getenv("PASSWORD"), help="SSH password.")
+    parser.add_argument("--rounds", type=int, default=3, help="Connections per combination.")
+    parser.add_argument("--write", type=str, default=None, metavar="PATH",
+                        help="Write the fastest combination as a profile for --ssh-profile.")
+    return parser.parse_args()
+
+def main():
+    setup_logging(rich=False)
+    args = parse_arguments()
+    results = benchmark(args.host, args.user, args.password, args.rounds)
+    if not results:
+        logging.error(f"No combination could connect to {args.host}.")
+        raise SystemExit(1)
+    print(f"{'Kex':<40} {'Cipher':<12} {'Compression':<12} {'Seconds':>8}")
+    for kex_name, cipher, compression, seconds in results:
+        print(f"{kex_name:<40} {cipher:<12} {'on' if compression else 'off':<12} {seconds:>8.3f}")
+    if args.write:
+        # Images that lack the winner fall back to paramiko's defaults (see SSHManager)
+        kex_name, cipher, compression, _ = results[0]
+        ConnectionProfile([kex_name], [cipher], compression, known_hosts=default_profile.known_hosts).save(args.write)
+
+if __name__ == "__main__":
+    main()
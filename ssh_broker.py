@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+from Modules.log import setup_logging
+from Modules.ssh_broker import DEFAULT_SOCKET, SSHBroker
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Persistent SSH connection broker.")
+    parser.add_argument("--socket", default=os.getenv("SSH_BROKER_SOCKET", DEFAULT_SOCKET),
+                        help="Path of the Unix socket to listen on.")
+    parser.add_argument("--idle-timeout", type=int, default=300,
+                        help="Seconds after which an unused connection is closed.")
+    return parser.parse_args()
+
+def main():
+    setup_logging(rich=False)
+    args = parse_arguments()
+    SSHBroker(args.socket, args.idle_timeout).serve_forever()
+
+if __name__ == "__main__":
+    main()